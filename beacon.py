@@ -1,47 +1,61 @@
-from utils import hexify_ip, unhexify_ip, MsgType, Config, get_target_range
-from typing import Optional, List, Tuple
-from base64 import b64encode, b64decode
-from bucket_list import BucketList
-from event_chain import EventChain
+from utils import hexify_ip, unhexify_ip, MsgType, Config, sha1_id, id_to_hex, hex_to_id, local_address
+from typing import Optional, List, Tuple, Dict, Callable, Awaitable
+from routing_table import RoutingTable
+from value_store import ValueStore, Providers
+from value_log import ValueLog
+from event_log import EventLog
 from Crypto.PublicKey import ECC
 from Crypto.Signature import DSS
 from Crypto.Hash import SHA512
-from Crypto.Cipher import AES
 from threading import Thread
+from key_exchange import generate_key_pair, derive_key
+from session import Session, SessionCache, Cookies, INITIATOR, RESPONDER
+from transfer import SharedFile, ChunkCache, Download, Manifest, decode_chunk
+from stats import LatencyStats
 from kbucket import KBucket
+from lookup import Lookup
 from event import Event
 from peer import Peer
 from file import File
+from transport import Transport
+from wire import Frame
+import proof_of_work
+import threading
 import tempfile
+import asyncio
 import hashlib
 import socket
 import random
 import struct
-import gzip
-import json
 import uuid
+import wire
 import time
-import ssl
 import os
 
 
 class Beacon(Thread):
     def __init__(self, port: int, boot_port: int):
         super().__init__()
-        self.addr:          str = socket.gethostbyname(socket.gethostname())
+        self.addr:          str = local_address()
         self.port:          int = port
-        self.id:            str = hashlib.sha1(self.addr.encode() + bytes(self.port)).hexdigest()
+        self.id:            int = sha1_id(self.addr.encode() + bytes(self.port))
         self.boot_port:     int = boot_port
-        self.sock:          socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.routing_table: BucketList = BucketList()
-        self.storage:       BucketList = BucketList()
-        self.events:        EventChain = EventChain()
+        self.routing_table: RoutingTable = RoutingTable(self.id)
+        self.transport:     Transport = Transport(self.port, self.handle, self.routing_table.touch)
+        self.stats:         LatencyStats = self.transport.stats
+        self.storage:       ValueStore = ValueStore(log=ValueLog(os.path.join(tempfile.gettempdir(), id_to_hex(self.id), "values")))
+        self.events:        EventLog = EventLog(os.path.join(tempfile.gettempdir(), id_to_hex(self.id), "events"))
+        self.shared:        Dict[int, SharedFile] = {}
+        self.providers:     Providers = Providers()
+        self.stopping:      threading.Event = threading.Event()
+        self.chunk_cache:   ChunkCache = ChunkCache()
+        self.downloads:     str = os.path.join(tempfile.gettempdir(), id_to_hex(self.id), "files")
         self.buffer_size:   int = Config.BufferSize.value
         self.alpha:         int = Config.Alpha.value
+        self.k_nodes:       int = Config.KNodes.value
         self.last_update:   Optional[float] = None
-        self.key_length:    int = Config.KeyLength.value
-        self.generator:     int = Config.Generator.value
-        self.prime:         Optional[int] = None
+        self.sessions:      SessionCache = SessionCache()
+        self.cookies:       Cookies = Cookies()
         self.pub_key:       str = Config.PubKey.value
         self.backup_hosts:  List[str] = Config.BackupHosts.value
 
@@ -49,201 +63,170 @@ class Beacon(Thread):
     def get_mac_address() -> str:
         return ':'.join(['{:02x}'.format((uuid.getnode() >> el) & 0xff) for el in range(0, 8 * 6, 8)][::-1])
 
-    def generate_private_key(self) -> int:
-        return int.from_bytes(ssl.RAND_bytes(self.key_length), byteorder='big')
-
-    def generate_public_key(self, private_key: int) -> int:
-        return pow(self.generator, private_key, self.prime)
-
-    def get_key(self, remote_pub_key: int, private_key: int) -> bytes:
-        shared_secret = pow(remote_pub_key, private_key, self.prime)
-        shared_secret_bytes = shared_secret.to_bytes(shared_secret.bit_length() // 8 + 1, byteorder="big")
-        return hashlib.sha256(shared_secret_bytes).digest()
-
-    def perform_key_exchange(self) -> Optional[bytes]:
-
-        response = b""
-        msg_size = struct.calcsize(">L")
-        while len(response) < msg_size:
-            data, _ = self.sock.recvfrom(self.buffer_size)
-            response += data
-
-        packed_msg_size = response[:msg_size]
-        response = response[msg_size:]
-        msg_size = struct.unpack(">L", packed_msg_size)[0]
-        addr = None
-        while len(response) < msg_size:
-            data, addr = self.sock.recvfrom(self.buffer_size)
-            response += data
-
-        response = json.loads(b64decode(response))
+    def send_message(self, addr: Tuple[str, int], response: bytes) -> None:
+        self.transport.sendto(response, addr)
 
+    def perform_key_exchange(self, request: Frame, addr: Tuple[str, int]) -> Optional[Session]:
         try:
-            nonce = int(response['nonce'])
-            prime = int(response['prime'])
-            remote_pub_key = int(response['pub_key'])
-            port = int(response['port'])
-        except (KeyError, ValueError):
+            nonce, remote_pub_key = wire.unpack_handshake(request.body)
+        except struct.error:
             return
 
-        if prime.bit_length() == 2048:
-            self.prime = prime
-            peer_id = hashlib.sha1(addr[0].encode()+bytes(port)).hexdigest()
-            peer = self.routing_table.find_node(peer_id)
-            if not peer:
-                peer = Peer(port)
-            min_target, max_target = get_target_range(peer.difficulty, len(self.id))
-            peer_id = int(self.id, 16).to_bytes(len(self.id), byteorder='big')
-            h = hashlib.sha1(peer_id+bytes(nonce)).hexdigest()
-            if min_target < int(h, 16) < max_target:
-                private_key = self.generate_private_key()
-                pub_key = self.generate_public_key(private_key)
-                response = pub_key.to_bytes(pub_key.bit_length() // 8 + 1, byteorder="big")
-
-                msg_size = struct.pack(">L", len(response))
-                self.sock.sendto(msg_size, addr)
-
-                while response:
-                    self.sock.sendto(response[:self.buffer_size], addr)
-                    response = response[self.buffer_size:]
-
-                return self.get_key(remote_pub_key, private_key)
-
-    def send(self, addr: Tuple[str, int], key: bytes, header: Optional[MsgType] = "", msg: Optional[str] = "") -> None:
-        cipher = AES.new(key, AES.MODE_GCM)
-        cipher.update(header.encode())
-        ciphertext, tag = cipher.encrypt_and_digest(msg.encode())
-        json_k = ['nonce', 'header', 'ciphertext', 'tag']
-        json_v = [b64encode(x).decode('utf-8') for x in [cipher.nonce, header.encode(), ciphertext, tag]]
-
-        encoded_msg = b64encode(json.dumps(dict(zip(json_k, json_v))).encode())
-        msg_size = struct.pack(">L", len(encoded_msg))
-        self.sock.sendto(msg_size, addr)
-
-        while encoded_msg:
-            self.sock.sendto(encoded_msg[:self.buffer_size], addr)
-            encoded_msg = encoded_msg[self.buffer_size:]
-
-    def receive(self, key: bytes) -> Tuple[str, str, str, Tuple[str, int]]:
-        response = b""
-        msg_size = struct.calcsize(">L")
-        while len(response) < msg_size:
-            data, _ = self.sock.recvfrom(self.buffer_size)
-            response += data
-
-        packed_msg_size = response[:msg_size]
-        response = response[msg_size:]
-        msg_size = struct.unpack(">L", packed_msg_size)[0]
-        addr = None
-        while len(response) < msg_size:
-            data, addr = self.sock.recvfrom(self.buffer_size)
-            response += data
-
-        b64 = json.loads(b64decode(response))
-        json_k = ['nonce', 'header', 'ciphertext', 'tag']
-        jv = {k: b64decode(b64[k]) for k in json_k}
-        cipher = AES.new(key, AES.MODE_GCM, nonce=jv['nonce'])
-        cipher.update(jv['header'])
-
-        header = jv['header'].decode()
-        data = json.loads(cipher.decrypt_and_verify(jv['ciphertext'], jv['tag']).decode())
-        msg = data['msg']
-        port = data['port']
-        return header, msg, port, addr
-
-    def bootstrap(self) -> Optional[KBucket]:
-        return self.find_node(self.id, Peer(self.boot_port))
-
-    def find_node(self, peer_id: str, boot_peer: Optional[Peer] = None, nearest_bucket: Optional[KBucket] = None) -> Optional[KBucket]:
-        if not boot_peer:
-            closest_bucket = self.routing_table.find_closest(peer_id)
-            boot_peer = closest_bucket.find_closest(peer_id)
-
-        if not nearest_bucket:
-            response = boot_peer.find_node(peer_id, self.port)
-            if not response:
+        port = request.port
+        peer = self.routing_table.find_node(sha1_id(addr[0].encode()+bytes(port)))
+        if not peer:
+            peer = Peer(port, addr[0])
+        if proof_of_work.verify(self.id, peer.difficulty, nonce):
+            private_key, pub_key = generate_key_pair()
+            try:
+                session = Session(derive_key(private_key, remote_pub_key), self.sessions.ttl)
+            except ValueError:
+                return
+            self.sessions.put(session.id, session)
+            # the cookie outlives the session, so later probes can still be answered with a keyed tag
+            epoch, cookie = self.cookies.issue(addr)
+            body = wire.pack_handshake_ack(epoch, wire.mask_cookie(session.key, cookie), pub_key)
+            response = Frame(MsgType.HandshakeAck, self.port, request.msg_id, session.id, body=body)
+            self.send_message(addr, wire.encode(response))
+            return session
+
+    def send(self, addr: Tuple[str, int], session: Session, request: Frame, header: MsgType, payload: bytes = b"") -> None:
+        response = Frame(header, self.port, request.msg_id, session.id)
+        self.send_message(addr, wire.seal(response, session.key, payload, session.nonce(RESPONDER)))
+
+    def receive(self, request: Frame, session: Session) -> bytes:
+        return wire.unseal(request, session.key, in_place=not request.body.readonly)
+
+    async def bootstrap(self) -> Optional[KBucket]:
+        return await self.find_node_async(self.id, Peer(self.boot_port))
+
+    def find_node(self, peer_id: int) -> Optional[KBucket]:
+        return self.transport.call(self.find_node_async(peer_id))
+
+    async def find_node_async(self, peer_id: int, boot_peer: Optional[Peer] = None) -> Optional[KBucket]:
+        seeds = [boot_peer] if boot_peer else self.routing_table.k_closest(peer_id, self.k_nodes)
+        if not seeds:
+            return None
+
+        async def query(peer: Peer) -> Optional[List[Peer]]:
+            response = await peer.find_node_async(peer_id, self.port)
+            if not response or response[0] != MsgType.Found:
                 return None
-
-            header, data, addr = response
-            if header == MsgType.Found:
-                data = json.loads(data)
-                bucket = KBucket()
-                for peer in data:
-                    peer = Peer(int(peer[1]))
-                    if peer.id != boot_peer.id:
-                        response = peer.ping(self.port)
-                        if response:
-                            bucket.add(peer)
-                    else:
-                        bucket.add(peer)
-                self.routing_table.append(bucket)
-                return self.find_node(peer_id, boot_peer, bucket)
-        else:
-            nearest = nearest_bucket.find_closest(peer_id).id
-            if nearest == boot_peer.id:
-                return nearest_bucket
-            original = nearest
-            ordered = nearest_bucket.find_a_closest(peer_id)
-            for p in ordered:
-                if p.id != boot_peer.id:
-                    header, data, addr = p.find_node(peer_id, self.port)
-                    if header == MsgType.Found:
-                        data = json.loads(data)
-                        bucket = KBucket()
-                        for peer in data:
-                            peer = Peer(int(peer[1]))
-                            if not self.routing_table.find_node(peer.id) and peer.id != self.id:
-                                response = peer.ping(self.port)
-                                if response:
-                                    self.routing_table.add_node(self.port, peer)
-                                    bucket.add(peer)
-
-                        if bucket.size() > 0:
-                            closest = bucket.find_closest(peer_id).id
-                            if closest < nearest:
-                                nearest = closest
-                                nearest_bucket = bucket
-
-            if nearest < original:
-                return self.find_node(peer_id, boot_peer, nearest_bucket)
-
-        return nearest_bucket
-
-    def find_value(self, key: str) -> None:
-        closest_bucket = self.find_node(key)
-        kv_pair = None
-        for peer in closest_bucket.preorder():
-            header, data, addr = peer.find_value(key, self.port)
-            if header == MsgType.Found:
-                kv_pair = json.loads(data)
+            self.routing_table.add_node(self.port, peer)
+            contacts = (Peer(port, addr) for addr, port in wire.unpack_contacts(response[1]))
+            return [self.routing_table.find_node(contact.id) or contact for contact in contacts if contact.id != self.id]
+
+        start = time.monotonic()
+        closest = await Lookup(peer_id, query, self.k_nodes, self.alpha).run(seeds)
+        self.stats.record('find_node', time.monotonic() - start)
+        if not closest:
+            return None
+        bucket = KBucket()
+        for peer in closest:
+            bucket.add(peer)
+        return bucket
+
+    def find_value(self, hex_key: str) -> None:
+        self.transport.call(self.find_value_async(hex_key))
+
+    async def find_value_async(self, hex_key: str) -> None:
+        start = time.monotonic()
+        try:
+            await self.fetch_value(hex_key)
+        finally:
+            self.stats.record('find_value', time.monotonic() - start)
+
+    async def fetch_value(self, hex_key: str) -> None:
+        key = hex_to_id(hex_key)
+        closest_bucket = await self.find_node_async(key)
+        if not closest_bucket:
+            return
+        file = None
+        holders = {}
+        responses = await asyncio.gather(*(peer.find_value_async(key, self.port) for peer in closest_bucket.inorder()))
+        for response in responses:
+            if not response or response[0] != MsgType.Found:
+                continue
+            try:
+                found, contacts = wire.unpack_value(response[1])
+            except (ValueError, struct.error):
+                # UnicodeDecodeError from a garbled filename is a ValueError too; one bad answer only loses that holder
+                continue
+            if found.id != key:
+                continue
+            file = file or found
+            for addr, port in contacts:
+                if (addr, port) != (self.addr, self.port):
+                    holders.setdefault((addr, port), self.routing_table.find_node(sha1_id(addr.encode() + bytes(port))) or Peer(port, addr))
+
+        if file:
+            self.storage.add(file)
+            if not holders:
+                closest_bucket = await self.find_node_async(file.owner)
+                owner = closest_bucket.find_node(file.owner) if closest_bucket else None
+                if owner:
+                    holders[owner.address()] = owner
+            path = await self.download(file, list(holders.values())) if holders else None
+            if path:
+                print(path)
+
+    async def manifest_from(self, file: File, peer: Peer) -> Optional[Manifest]:
+        response = await peer.get_value_async(file.id, self.port)
+        if not response or response[0] != MsgType.Found:
+            return None
+        try:
+            manifest = wire.unpack_manifest(response[1])
+        except (ValueError, struct.error):
+            return None
+        # the size comes from the lookup metadata, a holder that disagrees describes some other file
+        return manifest if manifest.size == file.size else None
+
+    async def download(self, file: File, peers: List[Peer]) -> Optional[str]:
+        def source(peer: Peer, chunk_size: int) -> Callable[[int], Awaitable[Optional[bytes]]]:
+            async def fetch(index: int) -> Optional[bytes]:
+                response = await peer.get_chunk_async(file.id, index, self.port)
+                return decode_chunk(response[1], chunk_size) if response and response[0] == MsgType.Found else None
+            return fetch
+
+        path = os.path.join(self.downloads, id_to_hex(file.id))
+        tried = set()
+        rejected = set()
+        for supplier in peers:
+            manifest = await self.manifest_from(file, supplier)
+            if not manifest or (manifest.chunk_size, manifest.hashes) in tried:
+                continue
+            tried.add((manifest.chunk_size, manifest.hashes))
+            sources = [source(peer, manifest.chunk_size) for peer in peers if peer.address() not in rejected]
+            if await Download(manifest, path, file.id).run(sources):
                 break
+            # one bad manifest fails every honest chunk, so the next holder's manifest gets a turn
+            # and the holder that handed this one out is no longer asked for chunks
+            rejected.add(supplier.address())
+        else:
+            return None
 
-        if kv_pair:
-            file = File()
-            file.from_tuple(kv_pair)
-            self.storage.add_node(self.port, file)
-            closest_bucket = self.find_node(file.owner)
-            owner = closest_bucket.find_node(file.owner)
-
-            header, file_contents, addr = owner.get_value(file.filename, self.port)
-            if header == MsgType.Found:
-                file_contents = gzip.decompress(b64decode(file_contents.encode()))
-                if hashlib.sha1(file_contents).hexdigest() == file.id:
-                    print(file_contents.decode())
-                    '''
-                    with open(file.filename, 'wb') as f:
-                        f.write(b64decode(file_contents.encode()))
-                    '''
-            else:
-                print(header)
+        # every finished download becomes another source for the next one
+        shared = SharedFile(path, manifest.chunk_size)
+        shared.manifest = manifest
+        self.shared[file.id] = shared
+        await self.publish(file)
+        return path
 
     def store(self, filename: str) -> None:
-        with open(filename, 'rb') as f:
-            file = File(self.id, f)
+        self.transport.call(self.store_async(filename))
 
-        closest_bucket = self.find_node(file.id)
-        for peer in closest_bucket.preorder():
-            peer.store(file, self.port)
+    async def store_async(self, filename: str) -> None:
+        shared = SharedFile(filename)
+        manifest = await asyncio.get_running_loop().run_in_executor(None, shared.describe)
+        file = File(self.id)
+        file.id, file.filename, file.size = manifest.file_id, filename, manifest.size
+        self.shared[file.id] = shared
+        await self.publish(file)
+
+    async def publish(self, file: File) -> None:
+        closest_bucket = await self.find_node_async(file.id)
+        if closest_bucket:
+            await asyncio.gather(*(peer.store_async(file, self.port) for peer in closest_bucket.inorder()))
 
     def save_state(self) -> None:
         while True:
@@ -252,25 +235,60 @@ class Beacon(Thread):
                 for peer in self.routing_table.as_tuples():
                     table += hexify_ip(peer[0]) + "\n"
 
-                if not os.path.isdir(os.path.join(tempfile.gettempdir(), self.id)):
-                    os.mkdir(os.path.join(tempfile.gettempdir(), self.id))
+                if not os.path.isdir(os.path.join(tempfile.gettempdir(), id_to_hex(self.id))):
+                    os.mkdir(os.path.join(tempfile.gettempdir(), id_to_hex(self.id)))
 
-                with open(os.path.join(tempfile.gettempdir(), self.id, socket.gethostname() + ".log"), 'w') as f:
+                with open(os.path.join(tempfile.gettempdir(), id_to_hex(self.id), socket.gethostname() + ".log"), 'w') as f:
                     f.write(table)
 
                 self.last_update = time.time()
             time.sleep(10)
 
+    def check_liveness(self) -> None:
+        while True:
+            batch = [self.routing_table.stale.get()]
+            while len(batch) < Config.ProbeBatch.value and not self.routing_table.stale.empty():
+                batch.append(self.routing_table.stale.get())
+            for peer, alive in zip(batch, self.transport.call(self.probe_all(batch))):
+                self.routing_table.probed(peer, alive)
+
+    def maintain_storage(self) -> None:
+        # group commit: stores are answered once buffered and reach the disk within FlushInterval;
+        # the same pass keeps the index close behind the log, so a restart has little to replay
+        while not self.stopping.wait(Config.FlushInterval.value):
+            self.storage.maintain()
+
+    async def probe_all(self, peers: List[Peer]) -> List[bool]:
+        return await asyncio.gather(*(peer.probe_async(self.port) for peer in peers))
+
+    def answer_probe(self, request: Frame, addr: Tuple[str, int]) -> None:
+        try:
+            challenge, epoch = wire.unpack_probe(request.body)
+        except struct.error:
+            return
+        session = self.sessions.get(request.session)
+        if session:
+            tag = wire.probe_tag(session.key, challenge)
+        else:
+            cookie = self.cookies.cookie(epoch, addr)
+            tag = wire.probe_tag(cookie, challenge) if cookie else b""
+        self.send_message(addr, wire.encode(Frame(MsgType.ProbeAck, self.port, request.msg_id, request.session, body=challenge + tag)))
+
     def broadcast(self, event: Event) -> None:
         all_peers = self.routing_table.list_nodes()
         a_peers = random.choices(all_peers, k=self.alpha)
         for peer in a_peers:
-            peer.send(self.port, MsgType.Event, json.dumps({"msg": event.data, "sig": b64encode(event.signature).decode()}))
+            self.transport.spawn(peer.send_async(self.port, MsgType.Event, wire.pack_event(event.data, event.signature)))
 
     def run(self) -> None:
-        self.sock.bind((self.addr, self.port))
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self.transport.open(self.addr))
+        Thread(target=self.check_liveness, daemon=True).start()
+        maintenance = Thread(target=self.maintain_storage, daemon=True)
+        maintenance.start()
         if self.boot_port:
-            self.bootstrap()
+            loop.run_until_complete(self.bootstrap())
             print(self.routing_table.as_tuples())
         '''
             if err:
@@ -282,7 +300,7 @@ class Beacon(Thread):
 
         else:
             try:
-                with open(os.path.join(tempfile.gettempdir(), self.id, socket.gethostname()+".log"), 'r') as f:
+                with open(os.path.join(tempfile.gettempdir(), id_to_hex(self.id), socket.gethostname()+".log"), 'r') as f:
                     hexaddrs = f.readlines()
 
                 for hexaddr in hexaddrs:
@@ -299,78 +317,109 @@ class Beacon(Thread):
                         break
         '''
         # Thread(target=self.store_table).start()
+        loop.run_forever()
+        self.stopping.set()
+        maintenance.join()
+        self.storage.close()
+        self.events.close()
+
+    def stop(self) -> None:
+        self.transport.loop.call_soon_threadsafe(self.transport.loop.stop)
+        self.join()
+
+    def handle(self, request: Frame, addr: Tuple[str, int]) -> None:
+        if request.type == MsgType.Probe:
+            self.answer_probe(request, addr)
+            return
 
-        while True:
-            key = self.perform_key_exchange()
-            if not key:
-                continue
-            try:
-                header, data, port, addr = self.receive(key)
-            except TypeError:
-                continue
+        if request.type == MsgType.Handshake:
+            self.perform_key_exchange(request, addr)
+            return
 
-            if header == MsgType.Ping:
-                peer_id = hashlib.sha1(addr[0].encode() + bytes(int(port))).hexdigest()
-                found = self.routing_table.find_node(peer_id)
-                if not found:
-                    self.routing_table.add_node(self.port, Peer(int(port)))
-                self.send(addr, key, MsgType.Pong)
-
-            if header == MsgType.FindNode:
-                peer_id = data
-                bucket = self.routing_table.find_closest(peer_id)
-                if bucket:
-                    self.send(addr, key, MsgType.Found, json.dumps(bucket.as_tuples()+[(self.addr, self.port)]))
-                else:
-                    self.send(addr, key, MsgType.Found, json.dumps([(self.addr, self.port)]))
-
-                peer_id = hashlib.sha1(addr[0].encode() + bytes(int(port))).hexdigest()
-                found = self.routing_table.find_node(peer_id)
-                if not found:
-                    self.routing_table.add_node(self.port, Peer(int(port)))
-
-            if header == MsgType.FindValue:
-                node_id = data
-                file = self.storage.find_node(node_id)
-                if file:
-                    self.send(addr, key, MsgType.Found, json.dumps(file.as_tuple()))
-                else:
-                    self.send(addr, key, MsgType.NotFound)
-
-            if header == MsgType.GetValue:
-                filename = data
+        session = self.sessions.get(request.session)
+        if not session:
+            self.send_message(addr, wire.encode(Frame(MsgType.Rekey, self.port, request.msg_id, request.session)))
+            return
+
+        try:
+            data = self.receive(request, session)
+        except ValueError:
+            return
+        if not session.accept(request.nonce, INITIATOR):
+            # replayed or far out of the window
+            return
+        header, port = request.type, request.port
+
+        sender_id = sha1_id(addr[0].encode() + bytes(port))
+        known = self.routing_table.touch(sender_id)
+
+        if header == MsgType.Ping:
+            if not known:
+                self.routing_table.add_node(self.port, Peer(port, addr[0]))
+            self.send(addr, session, request, MsgType.Pong)
+
+        if header == MsgType.FindNode:
+            peer_id = wire.unpack_id(data)
+            closest = self.routing_table.k_closest(peer_id, self.k_nodes)
+            contacts = [peer.address() for peer in closest] + [(self.addr, self.port)]
+            self.send(addr, session, request, MsgType.Found, wire.pack_contacts(contacts))
+
+            if not known:
+                self.routing_table.add_node(self.port, Peer(port, addr[0]))
+
+        if header == MsgType.FindValue:
+            node_id = wire.unpack_id(data)
+            file = self.storage.get(node_id)
+            if file:
+                self.send(addr, session, request, MsgType.Found, wire.pack_value(file, self.providers.get(node_id)))
+            else:
+                self.send(addr, session, request, MsgType.NotFound)
+
+        if header == MsgType.GetValue:
+            shared = self.shared.get(wire.unpack_id(data))
+            if shared:
+                self.send(addr, session, request, MsgType.Found, wire.pack_manifest(shared.describe()))
+            else:
+                self.send(addr, session, request, MsgType.NotFound)
+
+        if header == MsgType.GetChunk:
+            file_id, index = wire.unpack_chunk_request(data)
+            shared = self.shared.get(file_id)
+            chunk = shared.chunk(index, self.chunk_cache) if shared else None
+            if chunk is not None:
+                self.send(addr, session, request, MsgType.Found, chunk)
+            else:
+                self.send(addr, session, request, MsgType.NotFound)
+
+        if header == MsgType.GetRange:
+            file_id, offset, length = wire.unpack_range_request(data)
+            shared = self.shared.get(file_id)
+            if shared:
+                self.send(addr, session, request, MsgType.Found, shared.range(offset, min(length, shared.chunk_size)))
+            else:
+                self.send(addr, session, request, MsgType.NotFound)
+
+        if header == MsgType.Store:
+            file = wire.unpack_file(data)
+            self.storage.add(file)
+            self.providers.add(file.id, (addr[0], port))
+            print(len(self.storage))
+            self.send(addr, session, request, MsgType.Stored)
+
+        if header == MsgType.Event:
+            msg, signature = wire.unpack_event(data)
+            latest_event = self.events.last()
+            if latest_event and latest_event.signature != signature or not latest_event:
+
+                pub_key = ECC.import_key(self.pub_key)
+                h = SHA512.new(msg.encode())
+                verifier = DSS.new(pub_key, 'fips-186-3')
                 try:
-                    with open(filename, 'rb') as f:
-                        data = b64encode(gzip.compress(f.read())).decode()
-                        self.send(addr, key, MsgType.Found, data)
-
-                except FileNotFoundError:
-                    self.send(addr, key, MsgType.NotFound)
-
-            if header == MsgType.Store:
-                data = json.loads(data)
-                file = File()
-                file.from_tuple(data)
-                self.storage.add_node(self.port, file)
-                print(self.storage.as_tuples())
-                self.send(addr, key, MsgType.Stored)
-
-            if header == MsgType.Event:
-                data = json.loads(data)
-                msg = data['msg']
-                signature = b64decode(data['sig'].encode())
-                latest_event = self.events.last()
-                if latest_event and latest_event.signature != signature or not latest_event:
-
-                    pub_key = ECC.import_key(self.pub_key)
-                    h = SHA512.new(msg.encode())
-                    verifier = DSS.new(pub_key, 'fips-186-3')
-                    try:
-                        verifier.verify(h, signature)
-                        print(f"\n{hashlib.sha1(addr[0].encode()+bytes(int(port))).hexdigest()} {msg}", end="\n>> ")
-                        event = Event(msg, signature)
-                        self.broadcast(event)
-                        Thread(target=self.events.add, args=(event,)).start()
-                    except ValueError as e:
-                        print(e)
-                        print("The message is not authentic.")
+                    verifier.verify(h, signature)
+                    print(f"\n{hashlib.sha1(addr[0].encode()+bytes(port)).hexdigest()} {msg}", end="\n>> ")
+                    event = Event(msg, signature)
+                    self.broadcast(event)
+                    Thread(target=self.events.add, args=(event,)).start()
+                except ValueError as e:
+                    print(e)
+                    print("The message is not authentic.")
@@ -0,0 +1,29 @@
+from peer import Peer
+import argparse
+import tracemalloc
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contacts', type=int, default=100000)
+    args = parser.parse_args()
+
+    addresses = [(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 1024 + i % 1000) for i in range(args.contacts)]
+    start = time.perf_counter()
+    peers = [Peer(port, addr) for addr, port in addresses]
+    elapsed = time.perf_counter() - start
+    del peers
+
+    tracemalloc.start()
+    peers = [Peer(port, addr) for addr, port in addresses]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"contacts            {len(peers)}")
+    print(f"construct us/peer   {elapsed / len(peers) * 1e6:.2f}")
+    print(f"memory bytes/peer   {current / len(peers):.1f}")
+
+
+if __name__ == '__main__':
+    main()
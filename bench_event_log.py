@@ -0,0 +1,77 @@
+from event_log import EventLog
+from miner import Miner
+from event import Event
+import argparse
+import tempfile
+import random
+import shutil
+import time
+import os
+
+
+def random_events(n: int) -> list:
+    events = []
+    prev_hash = None
+    for i in range(n):
+        event = Event(f"event {i}", random.randbytes(64))
+        event.prev_hash = prev_hash
+        event.hash = random.randbytes(20).hex()
+        event.nonce = i
+        prev_hash = event.hash
+        events.append(event)
+    return events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    events = random_events(args.events)
+    directory = tempfile.mkdtemp()
+    try:
+        log = EventLog(directory, Miner(1))
+        start = time.perf_counter()
+        for event in events:
+            log.append(event)
+        log.checkpoint()
+        append = time.perf_counter() - start
+
+        sample = random.sample(events, min(args.lookups, len(events)))
+        start = time.perf_counter()
+        for event in sample:
+            assert log.get(event.hash).signature == event.signature
+        lookup = (time.perf_counter() - start) / len(sample)
+
+        start = time.perf_counter()
+        for _ in range(len(sample)):
+            log.last()
+        last = (time.perf_counter() - start) / len(sample)
+        log.close()
+
+        start = time.perf_counter()
+        log = EventLog(directory, Miner(1))
+        warm = time.perf_counter() - start
+        assert len(log) == len(events) and log.last().hash == events[-1].hash
+        log.close()
+
+        os.remove(os.path.join(directory, "checkpoint"))
+        start = time.perf_counter()
+        log = EventLog(directory, Miner(1))
+        replay = time.perf_counter() - start
+        assert len(log) == len(events)
+        log.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"{'events':>10} {'appends/s':>10} {'get us':>7} {'last us':>8} {'checkpoint s':>13} {'replay s':>9} {'MB':>6}")
+    print(f"{len(events):>10} {len(events) / append:>10.0f} {lookup * 1e6:>7.2f} {last * 1e6:>8.3f} "
+          f"{warm:>13.2f} {replay:>9.2f} {size / 1e6:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
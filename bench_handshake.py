@@ -0,0 +1,58 @@
+from key_exchange import generate_key_pair, derive_key
+from Crypto.Util import number
+from typing import Callable
+import argparse
+import hashlib
+import time
+import ssl
+
+
+def legacy_handshake(prime: int = 0) -> int:
+    if not prime:
+        prime = number.getPrime(2048, ssl.RAND_bytes)
+    a = int.from_bytes(ssl.RAND_bytes(540), byteorder='big')
+    b = int.from_bytes(ssl.RAND_bytes(540), byteorder='big')
+    a_pub, b_pub = pow(3, a, prime), pow(3, b, prime)
+    secret = pow(b_pub, a, prime)
+    assert secret == pow(a_pub, b, prime)
+    hashlib.sha256(secret.to_bytes(secret.bit_length() // 8 + 1, byteorder='big')).digest()
+    # prime + public key as decimal JSON integers
+    return len(str(prime)) + len(str(a_pub))
+
+
+def ecdh_handshake() -> int:
+    a, a_pub = generate_key_pair()
+    b, b_pub = generate_key_pair()
+    assert derive_key(a, b_pub) == derive_key(b, a_pub)
+    return len(a_pub)
+
+
+def rate(handshake: Callable[[], int], seconds: float) -> tuple:
+    count = 0
+    size = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds or count == 0:
+        size = handshake()
+        count += 1
+    return count / (time.perf_counter() - start), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    prime = number.getPrime(2048, ssl.RAND_bytes)
+    cases = (
+        ("dh, fresh 2048-bit prime", legacy_handshake),
+        ("dh, cached prime", lambda: legacy_handshake(prime)),
+        ("ecdh p-256", ecdh_handshake),
+    )
+    print(f"{'key agreement':>26} {'handshakes/s':>13} {'key bytes':>10}")
+    for name, handshake in cases:
+        per_second, size = rate(handshake, args.seconds)
+        print(f"{name:>26} {per_second:>13.1f} {size:>10}")
+
+
+if __name__ == '__main__':
+    main()
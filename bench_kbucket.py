@@ -0,0 +1,42 @@
+from bench_routing_table import random_nodes
+from kbucket import KBucket
+import argparse
+import random
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sizes', nargs='*', type=int, default=[20, 100, 1000, 10000])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'k':>7} {'add us':>9} {'find us':>9} {'split us':>10}")
+    for k in args.sizes:
+        random.seed(args.seed)
+        rounds = max(1, args.rounds * 20 // k)
+        add = find = split = 0.0
+        for _ in range(rounds):
+            nodes = random_nodes(k)
+            bucket = KBucket()
+
+            start = time.perf_counter()
+            for node in nodes:
+                bucket.add(node)
+            add += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for node in nodes:
+                bucket.find_node(node.id)
+            find += time.perf_counter() - start
+
+            start = time.perf_counter()
+            bucket.split_at(159)
+            split += time.perf_counter() - start
+
+        print(f"{k:>7} {add / (rounds * k) * 1e6:>9.2f} {find / (rounds * k) * 1e6:>9.2f} {split / rounds * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
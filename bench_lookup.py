@@ -0,0 +1,75 @@
+from bench_routing_table import random_nodes
+from routing_table import RoutingTable
+from typing import Dict, List, Optional
+from statistics import mean
+from lookup import Lookup
+from node import Node
+import argparse
+import asyncio
+import random
+import time
+
+
+class Network:
+    def __init__(self, n_nodes: int, k_nodes: int, timeout: float, loss: float):
+        self.nodes:     List[Node] = random_nodes(n_nodes)
+        self.k_nodes:   int = k_nodes
+        self.timeout:   float = timeout
+        self.loss:      float = loss
+        self.tables:    Dict[int, RoutingTable] = {}
+        self.latency:   Dict[int, float] = {node.id: random.uniform(0.01, 0.1) for node in self.nodes}
+        for node in self.nodes:
+            table = RoutingTable(node.id)
+            for other in random.sample(self.nodes, len(self.nodes)):
+                table.add_node(0, other)
+            self.tables[node.id] = table
+
+    async def find_node(self, node: Node, target: int) -> Optional[List[Node]]:
+        if random.random() < self.loss:
+            await asyncio.sleep(self.timeout)
+            return None
+        await asyncio.sleep(self.latency[node.id])
+        return self.tables[node.id].k_closest(target, self.k_nodes)
+
+
+async def lookup(network: Network, alpha: int) -> tuple:
+    origin = random.choice(network.nodes)
+    target = random.getrandbits(160)
+    seeds = network.tables[origin.id].k_closest(target, network.k_nodes)
+    search = Lookup(target, lambda node: network.find_node(node, target), network.k_nodes, alpha)
+    start = time.perf_counter()
+    closest = await search.run(seeds)
+    elapsed = time.perf_counter() - start
+    expected = sorted(network.nodes, key=lambda node: node.distance(target))[:network.k_nodes]
+    correct = len({node.id for node in closest} & {node.id for node in expected})
+    return search.hops(), search.rpcs, elapsed, correct / network.k_nodes
+
+
+async def bench(network: Network, alpha: int, lookups: int) -> List[tuple]:
+    return await asyncio.gather(*(lookup(network, alpha) for _ in range(lookups)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=500)
+    parser.add_argument('--lookups', type=int, default=100)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--alphas', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--loss', type=float, default=0.05)
+    parser.add_argument('--timeout', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    network = Network(args.nodes, args.k, args.timeout, args.loss)
+    print(f"{'alpha':>5} {'hops':>6} {'rpcs':>6} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for alpha in args.alphas:
+        results = asyncio.run(bench(network, alpha, args.lookups))
+        latencies = sorted(result[2] for result in results)
+        print(f"{alpha:>5} {mean(r[0] for r in results):>6.2f} {mean(r[1] for r in results):>6.1f} "
+              f"{latencies[len(latencies) // 2] * 1e3:>8.1f} {latencies[int(len(latencies) * 0.95)] * 1e3:>8.1f} "
+              f"{mean(r[3] for r in results):>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+from utils import get_target_range
+from event_log import EventLog
+from miner import Miner
+from event import Event
+import tempfile
+import argparse
+import hashlib
+import time
+import os
+
+
+def legacy_mine(hash_data: bytes, difficulty: int) -> int:
+    min_target, max_target = get_target_range(difficulty, 40)
+    nonce = 0
+    while True:
+        h = int.from_bytes(hashlib.sha1(hash_data + bytes(nonce)).digest(), byteorder='big')
+        if min_target < h < max_target:
+            return nonce
+        nonce += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=10)
+    parser.add_argument('--difficulty', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument('--no-legacy', action='store_true')
+    args = parser.parse_args()
+
+    events = [Event(f"event {i}", os.urandom(64)) for i in range(args.events)]
+    data = [EventLog.hash_data(event) for event in events]
+    print(f"{'miner':>12} {'ms/event':>9} {'Mhash/s':>8}")
+
+    if not args.no_legacy:
+        start = time.perf_counter()
+        hashes = sum(legacy_mine(hash_data, args.difficulty) + 1 for hash_data in data)
+        elapsed = time.perf_counter() - start
+        print(f"{'legacy':>12} {elapsed / len(data) * 1e3:>9.1f} {hashes / elapsed / 1e6:>8.3f}")
+
+    for workers in args.workers:
+        chain = EventLog(tempfile.mkdtemp(), Miner(workers))
+        chain.difficulty = args.difficulty
+        chain.miner.mine(data[0], 0)
+        chain.miner.hashes = 0
+        chain.miner.elapsed = 0.0
+        start = time.perf_counter()
+        for event in events:
+            chain.mine(event)
+            assert chain.verify(event)
+        elapsed = time.perf_counter() - start
+        print(f"{f'{workers} workers':>12} {elapsed / len(events) * 1e3:>9.1f} "
+              f"{chain.miner.hashes / chain.miner.elapsed / 1e6:>8.3f}")
+        chain.miner.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+from utils import id_to_hex
+import argparse
+import random
+import time
+import sys
+
+
+def closest_hex(ids, target: str) -> str:
+    return min(ids, key=lambda node_id: int(node_id, 16) ^ int(target, 16))
+
+
+def closest_bytes(ids, target: bytes) -> bytes:
+    key = int.from_bytes(target, byteorder='big')
+    return min(ids, key=lambda node_id: int.from_bytes(node_id, byteorder='big') ^ key)
+
+
+def closest_int(ids, target: int) -> int:
+    return min(ids, key=lambda node_id: node_id ^ target)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bucket', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    ints = [random.getrandbits(160) for _ in range(args.bucket)]
+    targets = [random.getrandbits(160) for _ in range(args.queries)]
+    representations = (
+        ("hex str", closest_hex, [id_to_hex(i) for i in ints], [id_to_hex(t) for t in targets]),
+        ("bytes", closest_bytes, [i.to_bytes(20, 'big') for i in ints], [t.to_bytes(20, 'big') for t in targets]),
+        ("int", closest_int, ints, targets),
+    )
+
+    print(f"{'id':>8} {'find_closest us':>16} {'bytes/id':>9}")
+    for name, closest, ids, queries in representations:
+        start = time.perf_counter()
+        for target in queries:
+            closest(ids, target)
+        elapsed = (time.perf_counter() - start) / len(queries)
+        size = sum(sys.getsizeof(i) for i in ids) / len(ids)
+        print(f"{name:>8} {elapsed * 1e6:>16.2f} {size:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+from utils import get_target_range, Config
+import proof_of_work
+import argparse
+import hashlib
+import random
+import time
+
+
+def legacy_nonce(node_id: int, difficulty: int) -> int:
+    id_length = Config.IdBits.value // 4
+    min_target, max_target = get_target_range(difficulty, id_length)
+    peer_id = node_id.to_bytes(id_length, byteorder='big')
+    nonce = 0
+    while True:
+        h = int.from_bytes(hashlib.sha1(peer_id + bytes(nonce)).digest(), byteorder='big')
+        if min_target < h < max_target:
+            return nonce
+        nonce += 1
+
+
+def timed(fn, ids, difficulty: int) -> float:
+    start = time.perf_counter()
+    for node_id in ids:
+        fn(node_id, difficulty)
+    return (time.perf_counter() - start) / len(ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--difficulties', type=int, nargs='+', default=[0, 1, 2, 3])
+    parser.add_argument('--ids', type=int, default=20)
+    parser.add_argument('--legacy-max', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    ids = [random.getrandbits(160) for _ in range(args.ids)]
+    print(f"{'difficulty':>10} {'legacy ms':>10} {'solve ms':>9} {'cached us':>10} {'verify us':>10}")
+    for difficulty in args.difficulties:
+        legacy = f"{timed(legacy_nonce, ids, difficulty) * 1e3:>10.2f}" if difficulty <= args.legacy_max else f"{'-':>10}"
+        proof_of_work.solve.cache_clear()
+        solve = timed(proof_of_work.solve, ids, difficulty)
+        cached = timed(proof_of_work.solve, ids, difficulty)
+        nonces = [proof_of_work.solve(node_id, difficulty) for node_id in ids]
+        start = time.perf_counter()
+        for node_id, nonce in zip(ids, nonces):
+            assert proof_of_work.verify(node_id, difficulty, nonce)
+        verify = (time.perf_counter() - start) / len(ids)
+        print(f"{difficulty:>10} {legacy} {solve * 1e3:>9.2f} {cached * 1e6:>10.2f} {verify * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+from beacon import Beacon
+from peer import Peer
+import argparse
+import time
+
+
+def measure(beacons, run, n: int) -> tuple:
+    sent = sum(beacon.transport.bytes_sent for beacon in beacons)
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(n):
+        run()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    sent = sum(beacon.transport.bytes_sent for beacon in beacons) - sent
+    return wall / n, cpu / n, sent / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=9301)
+    parser.add_argument('--n', type=int, default=200)
+    args = parser.parse_args()
+
+    server = Beacon(args.port, None)
+    client = Beacon(args.port + 1, None)
+    for beacon in (server, client):
+        beacon.daemon = True
+        beacon.start()
+    peer = Peer(args.port)
+    transport = client.transport
+    transport.opened.wait()
+    server.transport.opened.wait()
+
+    def cold_ping():
+        transport.sessions.pop(peer.address())
+        peer.ping(client.port)
+
+    def cookie_probe():
+        # both ends forgot the session, the responder's cookie alone keys the tag
+        transport.sessions.pop(peer.address())
+        peer.probe(client.port)
+
+    checks = (
+        ("ping, new session", cold_ping),
+        ("ping, cached session", lambda: peer.ping(client.port)),
+        ("probe", lambda: peer.probe(client.port)),
+        ("probe, cookie only", cookie_probe),
+    )
+    print(f"{'liveness check':>22} {'wall us':>9} {'cpu us':>9} {'bytes':>7}")
+    for name, run in checks:
+        wall, cpu, sent = measure((server, client), run, args.n)
+        print(f"{name:>22} {wall * 1e6:>9.0f} {cpu * 1e6:>9.0f} {sent:>7.0f}")
+
+
+if __name__ == '__main__':
+    main()
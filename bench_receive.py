@@ -0,0 +1,124 @@
+from transport import Transport, fragments
+from utils import MsgType, Config
+from threading import Thread
+from wire import Frame
+import argparse
+import asyncio
+import socket
+import struct
+import time
+import wire
+import ssl
+
+# the Linux value; the socket module does not export it
+SO_RCVBUFFORCE = getattr(socket, 'SO_RCVBUFFORCE', 33)
+
+
+def legacy_receive(sock: socket.socket, buffer_size: int) -> bytes:
+    response = b""
+    msg_size = struct.calcsize(">L")
+    while len(response) < msg_size:
+        data, _ = sock.recvfrom(buffer_size)
+        response += data
+
+    packed_msg_size = response[:msg_size]
+    response = response[msg_size:]
+    msg_size = struct.unpack(">L", packed_msg_size)[0]
+    while len(response) < msg_size:
+        data, _ = sock.recvfrom(buffer_size)
+        response += data
+    return response
+
+
+def legacy_send(sock: socket.socket, data: bytes, addr, buffer_size: int) -> None:
+    sock.sendto(struct.pack(">L", len(data)), addr)
+    while data:
+        sock.sendto(data[:buffer_size], addr)
+        data = data[buffer_size:]
+
+
+def reserve(sock: socket.socket, size: int) -> None:
+    # a whole message arrives as one burst; as root, grow the buffer past rmem_max so it fits
+    size = max(Config.RecvBuffer.value, 4 * size)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, size)
+    except OSError:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+
+def open_socket(size: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    reserve(sock, size)
+    sock.settimeout(5)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+def run_legacy(message: bytes, key: bytes, rounds: int) -> float:
+    buffer_size = Config.BufferSize.value
+    receiver = open_socket(len(message))
+    sender = open_socket(len(message))
+
+    def receive() -> None:
+        for _ in range(rounds):
+            wire.unseal(wire.decode(legacy_receive(receiver, buffer_size)), key)
+            receiver.sendto(b"\x00", sender.getsockname())
+
+    thread = Thread(target=receive)
+    thread.start()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        legacy_send(sender, message, receiver.getsockname(), buffer_size)
+        sender.recvfrom(1)
+    elapsed = time.perf_counter() - start
+    thread.join()
+    receiver.close()
+    sender.close()
+    return elapsed / rounds
+
+
+def run_transport(message: bytes, key: bytes, rounds: int, port: int) -> float:
+    loop = asyncio.new_event_loop()
+    Thread(target=loop.run_forever, daemon=True).start()
+
+    def handle(frame: Frame, addr) -> None:
+        wire.unseal(frame, key, in_place=not frame.body.readonly)
+        transport.write(b"\x00", addr)
+
+    transport = Transport(port, handle)
+    asyncio.run_coroutine_threadsafe(transport.open("127.0.0.1"), loop).result()
+    reserve(transport.sock, len(message))
+    sender = open_socket(len(message))
+    addr = transport.sock.getsockname()
+    chunk_size = transport.reassembler.chunk_size
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for header, chunk in fragments(message, chunk_size):
+            sender.sendmsg([header, chunk], [], 0, addr)
+        sender.recvfrom(1)
+    elapsed = time.perf_counter() - start
+    loop.call_soon_threadsafe(loop.stop)
+    sender.close()
+    return elapsed / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=9901)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000000, 16000000])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--legacy-rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'payload':>10} {'legacy ms':>10} {'transport ms':>13} {'MB/s':>8}")
+    for i, size in enumerate(args.sizes):
+        key = ssl.RAND_bytes(32)
+        message = wire.seal(Frame(MsgType.Store, 0, 1, bytes(8)), key, ssl.RAND_bytes(size))
+        legacy = run_legacy(message, key, args.legacy_rounds)
+        received = run_transport(message, key, args.rounds, args.port + i)
+        print(f"{size:>10} {legacy * 1e3:>10.2f} {received * 1e3:>13.2f} {size / received / 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+from bench_routing_table import random_nodes
+from routing_table import RoutingTable
+import argparse
+import random
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contacts', type=int, default=1000000)
+    parser.add_argument('--split-bits', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    table = RoutingTable(random.getrandbits(160), args.split_bits)
+    nodes = random_nodes(args.contacts)
+    latencies = []
+    for node in nodes:
+        start = time.perf_counter()
+        table.add_node(0, node)
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    buckets = table.list()
+    contacts = sum(len(bucket) for bucket in buckets)
+    replacements = sum(len(bucket.replacements) for bucket in buckets)
+    print(f"inserted       {args.contacts}")
+    print(f"buckets        {len(buckets)} (bound {table.max_buckets()})")
+    print(f"contacts       {contacts} (bound {table.max_buckets() * table.k_nodes})")
+    print(f"replacements   {replacements}")
+    print(f"insert mean us {sum(latencies) / len(latencies) * 1e6:.2f}")
+    print(f"insert p50 us  {latencies[len(latencies) // 2] * 1e6:.2f}")
+    print(f"insert p99 us  {latencies[int(len(latencies) * 0.99)] * 1e6:.2f}")
+    print(f"insert max us  {latencies[-1] * 1e6:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+from routing_table import RoutingTable
+from bucket_list import BucketList
+from typing import List
+from node import Node
+import argparse
+import random
+import time
+
+
+class Contact(Node):
+    def __init__(self, node_id: int):
+        super().__init__()
+        self.id:        int = node_id
+        self.last_seen: float = time.time()
+
+    def copy(self):
+        return Contact(self.id)
+
+    def as_tuple(self):
+        return self.id, self.last_seen
+
+    def is_older_than(self, n_seconds: int):
+        return False
+
+
+def random_nodes(n: int) -> List[Node]:
+    return [Contact(random.getrandbits(160)) for _ in range(n)]
+
+
+def bench(table, nodes: List[Node], targets: List[int]) -> dict:
+    start = time.perf_counter()
+    for node in nodes:
+        table.add_node(0, node)
+    insert = (time.perf_counter() - start) / len(nodes)
+
+    start = time.perf_counter()
+    for target in targets:
+        table.find_closest(target)
+    closest = (time.perf_counter() - start) / len(targets)
+
+    start = time.perf_counter()
+    for node in nodes[:len(targets)]:
+        table.find_node(node.id)
+    lookup = (time.perf_counter() - start) / len(targets)
+    return {"buckets": len(table), "insert": insert, "find_closest": closest, "find_node": lookup}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sizes', nargs='*', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'contacts':>9} {'table':>13} {'buckets':>8} {'insert us':>10} {'closest us':>11} {'find us':>9}")
+    for size in args.sizes:
+        random.seed(args.seed)
+        nodes = random_nodes(size)
+        targets = [random.getrandbits(160) for _ in range(args.queries)]
+        for name, table in (("BucketList", BucketList()), ("RoutingTable", RoutingTable())):
+            r = bench(table, nodes, targets)
+            print(f"{size:>9} {name:>13} {r['buckets']:>8} {r['insert'] * 1e6:>10.1f} "
+                  f"{r['find_closest'] * 1e6:>11.1f} {r['find_node'] * 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+from stats import LatencyStats
+from utils import Config
+from peer import Peer
+import argparse
+import random
+
+FIXED_TIMEOUT = 5.0
+
+
+def sample_rtt(base: float) -> float:
+    return base * random.lognormvariate(0, 0.3)
+
+
+def fixed_rpc(base: float, loss: float) -> tuple:
+    if random.random() < loss:
+        return FIXED_TIMEOUT, False
+    return sample_rtt(base), True
+
+
+def adaptive_rpc(peer: Peer, base: float, loss: float, retries: int) -> tuple:
+    elapsed = 0.0
+    for _ in range(retries + 1):
+        timeout = peer.timeout()
+        rtt = sample_rtt(base)
+        if random.random() >= loss and rtt < timeout:
+            peer.observe_rtt(rtt)
+            return elapsed + rtt, True
+        elapsed += timeout
+        peer.backoff()
+    return elapsed, False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--peers', type=int, default=200)
+    parser.add_argument('--rpcs', type=int, default=50)
+    parser.add_argument('--loss', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    retries = Config.Retries.value
+    bases = [random.choice((0.001, 0.02, random.uniform(0.05, 0.25))) for _ in range(args.peers)]
+    peers = [Peer(1024 + i, f"10.0.{i // 256}.{i % 256}") for i in range(args.peers)]
+    stats = LatencyStats(window=args.peers * args.rpcs)
+    failures = {'fixed': 0, 'adaptive': 0}
+
+    for _ in range(args.rpcs):
+        for peer, base in zip(peers, bases):
+            elapsed, ok = fixed_rpc(base, args.loss)
+            stats.record('fixed', elapsed)
+            failures['fixed'] += not ok
+            elapsed, ok = adaptive_rpc(peer, base, args.loss, retries)
+            stats.record('adaptive', elapsed)
+            failures['adaptive'] += not ok
+
+    total = args.peers * args.rpcs
+    print(f"{'timeouts':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>9} {'failed %':>9}")
+    for name, summary in stats.summary().items():
+        print(f"{name:>9} {summary['p50'] * 1e3:>8.1f} {summary['p95'] * 1e3:>8.1f} "
+              f"{summary['p99'] * 1e3:>9.1f} {failures[name] / total * 100:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
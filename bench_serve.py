@@ -0,0 +1,124 @@
+from transfer import SharedFile, ChunkCache, digest, decode_chunk
+from utils import MsgType, local_address
+from transport import Transport
+from beacon import Beacon
+from peer import Peer
+from threading import Thread
+import tempfile
+import argparse
+import asyncio
+import random
+import shutil
+import time
+import gzip
+import os
+
+
+def make_file(path: str, size: int, content: str) -> None:
+    # 'text' draws from 32 symbols, so level 1 deflate shrinks it to roughly two thirds
+    alphabet = bytes(range(97, 123)) + b" \n.,;:"
+    table = bytes(alphabet[i % 32] for i in range(256))
+    with open(path, 'wb') as f:
+        for offset in range(0, size, 1 << 20):
+            block = os.urandom(min(1 << 20, size - offset))
+            f.write(block.translate(table) if content == 'text' else block)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=9601)
+    parser.add_argument('--size', type=int, default=50, help="file size in MB")
+    parser.add_argument('--requesters', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--content', choices=('text', 'random'), default='text')
+    parser.add_argument('--no-legacy', action='store_true')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "hot.bin")
+    make_file(path, args.size << 20, args.content)
+    file_id = digest(path)
+
+    server = Beacon(args.port, None)
+    server.daemon = True
+    server.start()
+    server.transport.opened.wait()
+    shared = SharedFile(path)
+    chunks = len(shared.describe())
+    server.shared[file_id] = shared
+
+    loop = asyncio.new_event_loop()
+    Thread(target=loop.run_forever, daemon=True).start()
+    addr = local_address()
+    requesters = [Transport(args.port + 1 + i) for i in range(args.requesters)]
+
+    async def open_all() -> None:
+        for transport in requesters:
+            await transport.open(addr)
+    asyncio.run_coroutine_threadsafe(open_all(), loop).result()
+
+    def measure(kind: str) -> tuple:
+        latencies = []
+        received = [0]
+
+        async def requester(transport: Transport, deadline: float) -> None:
+            peer = Peer(args.port, addr)
+            while loop.time() < deadline:
+                index = random.randrange(chunks)
+                start = loop.time()
+                if kind == 'range':
+                    span = shared.manifest.span(index)
+                    response = await peer.get_range_async(file_id, span.start, len(span), transport.port)
+                    data = response[1] if response and response[0] == MsgType.Found else None
+                else:
+                    response = await peer.get_chunk_async(file_id, index, transport.port)
+                    data = decode_chunk(response[1], shared.chunk_size) if response and response[0] == MsgType.Found else None
+                if data is not None:
+                    latencies.append(loop.time() - start)
+                    received[0] += len(data)
+
+        async def run() -> float:
+            # warm up sessions so handshakes stay out of the numbers
+            await asyncio.gather(*(Peer(args.port, addr).ping_async(transport.port) for transport in requesters))
+            start = loop.time()
+            await asyncio.gather(*(requester(transport, start + args.duration) for transport in requesters))
+            return loop.time() - start
+
+        elapsed = asyncio.run_coroutine_threadsafe(run(), loop).result()
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] if latencies else 0.0
+        p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+        return len(latencies) / elapsed, received[0] / elapsed / (1 << 20), p50, p99
+
+    print(f"{args.size} MB {args.content} file, {chunks} chunks, {args.requesters} concurrent requesters")
+    print(f"{'serving':>22} {'req/s':>8} {'MB/s':>7} {'p50 ms':>7} {'p99 ms':>7} {'hit rate':>9}")
+    if not args.no_legacy:
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            gzip.compress(f.read())
+        cost = time.perf_counter() - start
+        print(f"{'legacy read+gzip':>22} {1 / cost:>8.2f} {args.size / cost:>7.1f} {cost * 1e3:>7.0f} {'':>7} {'':>9}")
+
+    modes = (
+        ("mmap range, raw", 'range', None),
+        ("chunk, no cache", 'chunk', ChunkCache(0)),
+        ("chunk, cold cache", 'chunk', ChunkCache()),
+    )
+    try:
+        for name, kind, cache in modes:
+            if cache:
+                server.chunk_cache = cache
+            rate, throughput, p50, p99 = measure(kind)
+            hits = f"{cache.hits / max(1, cache.hits + cache.misses):>9.2f}" if cache else f"{'':>9}"
+            print(f"{name:>22} {rate:>8.0f} {throughput:>7.1f} {p50 * 1e3:>7.1f} {p99 * 1e3:>7.1f} {hits}")
+            if name == "chunk, cold cache":
+                cache.hits = cache.misses = 0
+                rate, throughput, p50, p99 = measure(kind)
+                print(f"{'chunk, hot cache':>22} {rate:>8.0f} {throughput:>7.1f} {p50 * 1e3:>7.1f} {p99 * 1e3:>7.1f} "
+                      f"{cache.hits / max(1, cache.hits + cache.misses):>9.2f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+from transfer import SharedFile, Download, digest, decode_chunk
+from typing import Optional, List
+from beacon import Beacon
+from utils import MsgType
+from peer import Peer
+import tempfile
+import argparse
+import shutil
+import time
+import wire
+import os
+
+UNTHROTTLED = {}
+
+
+def throttle(beacon: Beacon, rate: float) -> None:
+    # pace the holder's outgoing datagrams to emulate a link of the given bytes/s
+    transport = beacon.transport
+    loop = transport.loop
+    write = UNTHROTTLED.setdefault(beacon.port, transport.write)
+    ready = [0.0]
+    if not rate:
+        transport.write = write
+        return
+
+    def send(datagram, addr):
+        now = loop.time()
+        start = max(now, ready[0])
+        ready[0] = start + len(datagram) / rate
+        if start > now:
+            loop.call_at(start, write, datagram, addr)
+        else:
+            write(datagram, addr)
+    transport.write = send
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=9501)
+    parser.add_argument('--size', type=int, default=32, help="file size in MB")
+    parser.add_argument('--replicas', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--rate', type=float, default=4, help="per holder MB/s, 0 for unthrottled")
+    parser.add_argument('--slow', type=float, default=10, help="one extra run where the last holder is this much slower")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "payload.bin")
+    with open(path, 'wb') as f:
+        for _ in range(args.size):
+            f.write(os.urandom(1 << 20))
+    file_id = digest(path)
+
+    count = max(args.replicas)
+    holders = [Beacon(args.port + i, None) for i in range(count)]
+    client = Beacon(args.port + count, None)
+    for beacon in holders + [client]:
+        beacon.daemon = True
+        beacon.start()
+    for beacon in holders + [client]:
+        beacon.transport.opened.wait()
+    shared = SharedFile(path)
+    shared.describe()
+    for beacon in holders:
+        beacon.shared[file_id] = shared
+
+    def download(peers: List[Peer]) -> Download:
+        async def run() -> Download:
+            response = await peers[0].get_value_async(file_id, client.port)
+            job = Download(wire.unpack_manifest(response[1]), os.path.join(directory, "copy"), file_id)
+
+            def source(peer: Peer):
+                async def fetch(index: int) -> Optional[bytes]:
+                    response = await peer.get_chunk_async(file_id, index, client.port)
+                    return decode_chunk(response[1], shared.chunk_size) if response and response[0] == MsgType.Found else None
+                return fetch
+
+            job.ok = await job.run([source(peer) for peer in peers])
+            return job
+        return client.transport.call(run())
+
+    runs = [(replicas, [args.rate] * replicas) for replicas in args.replicas]
+    if args.slow and count > 1:
+        runs.append((count, [args.rate] * (count - 1) + [args.rate / args.slow]))
+
+    print(f"{args.size} MB, {'unthrottled' if not args.rate else f'{args.rate:g} MB/s per holder'}")
+    print(f"{'holders':>8} {'slowest MB/s':>13} {'seconds':>8} {'MB/s':>7} {'hedged':>7} {'retransmits':>12} "
+          f"{'share per holder':>30}")
+    try:
+        for replicas, rates in runs:
+            for beacon, rate in zip(holders, rates):
+                throttle(beacon, rate * (1 << 20))
+            peers = [Peer(beacon.port) for beacon in holders[:replicas]]
+            start = time.perf_counter()
+            job = download(peers)
+            elapsed = time.perf_counter() - start
+            shares = " ".join(f"{source.received / job.manifest.size:.2f}" for source in job.sources)
+            slowest = f"{min(rates):g}" if args.rate else "-"
+            print(f"{replicas:>8} {slowest:>13} {elapsed:>8.2f} {args.size / elapsed:>7.1f} {job.hedged:>7} "
+                  f"{job.retransmits:>12} {shares:>30} {'' if job.ok else 'FAILED'}")
+            if job.ok:
+                os.remove(job.path)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
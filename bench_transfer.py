@@ -0,0 +1,93 @@
+from transfer import SharedFile, Download, digest, decode_chunk
+from typing import Optional
+from beacon import Beacon
+from utils import MsgType
+from file import File
+from peer import Peer
+import tempfile
+import argparse
+import resource
+import random
+import shutil
+import time
+import wire
+import os
+
+
+def make_file(path: str, size: int) -> None:
+    with open(path, 'wb') as f:
+        for offset in range(0, size, 1 << 20):
+            f.write(os.urandom(min(1 << 20, size - offset)))
+
+
+def lossy(transport, drop: float) -> None:
+    write = transport.write
+
+    def send(datagram, addr):
+        if random.random() >= drop:
+            write(datagram, addr)
+    transport.write = send
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=9401)
+    parser.add_argument('--size', type=int, default=100, help="file size in MB")
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--drop', type=float, default=0.0, help="fraction of server datagrams to drop")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "payload.bin")
+    make_file(path, args.size << 20)
+    with open(path, 'rb') as f:
+        file = File(None, f)
+    file.id = digest(path)
+
+    server = Beacon(args.port, None)
+    client = Beacon(args.port + 1, None)
+    for beacon in (server, client):
+        beacon.daemon = True
+        beacon.start()
+    server.transport.opened.wait()
+    client.transport.opened.wait()
+    if args.drop:
+        lossy(server.transport, args.drop)
+    shared = SharedFile(path)
+    start = time.perf_counter()
+    shared.describe()
+    manifest_time = time.perf_counter() - start
+    server.shared[file.id] = shared
+    peer = Peer(args.port)
+
+    print(f"{args.size} MB, {len(shared.manifest)} chunks of {shared.chunk_size >> 10} KB, "
+          f"manifest built in {manifest_time:.2f}s")
+    print(f"{'window':>7} {'seconds':>8} {'MB/s':>7} {'retransmits':>12} {'rss MB':>7} {'ok':>3}")
+    try:
+        for window in args.windows:
+            async def fetch(index: int) -> Optional[bytes]:
+                response = await peer.get_chunk_async(file.id, index, client.port)
+                return decode_chunk(response[1], shared.chunk_size) if response and response[0] == MsgType.Found else None
+
+            async def download() -> Download:
+                response = await peer.get_value_async(file.id, client.port)
+                job = Download(wire.unpack_manifest(response[1]), os.path.join(directory, f"copy-{window}"),
+                               file.id, window=window)
+                job.ok = await job.run([fetch])
+                return job
+
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.perf_counter()
+            job = client.transport.call(download())
+            elapsed = time.perf_counter() - start
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+            print(f"{window:>7} {elapsed:>8.2f} {args.size / elapsed:>7.1f} {job.retransmits:>12} "
+                  f"{rss / 1024:>7.1f} {'yes' if job.ok else 'no':>3}")
+            if job.ok:
+                os.remove(job.path)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
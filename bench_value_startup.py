@@ -0,0 +1,94 @@
+from value_store import ValueStore
+from value_log import ValueLog
+from file import File
+import argparse
+import tempfile
+import random
+import shutil
+import time
+import os
+
+
+def random_file(i: int) -> File:
+    file = File(random.getrandbits(160))
+    file.id = random.getrandbits(160)
+    file.filename = f"file-{i}.bin"
+    file.size = i
+    return file
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--maintain-every', type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    directory = tempfile.mkdtemp()
+    try:
+        store = ValueStore(capacity=args.records, log=ValueLog(directory))
+        ids = []
+        start = time.perf_counter()
+        for i in range(args.records):
+            file = random_file(i)
+            ids.append(file.id)
+            store.add(file)
+        populate = time.perf_counter() - start
+        start = time.perf_counter()
+        store.close()
+        compact = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = ValueStore(capacity=args.records, log=ValueLog(directory))
+        warm = time.perf_counter() - start
+        assert len(store) == args.records
+
+        sample = random.sample(ids, min(args.lookups, len(ids)))
+        start = time.perf_counter()
+        for file_id in sample:
+            assert store.get(file_id).id == file_id
+        cold_get = (time.perf_counter() - start) / len(sample)
+        start = time.perf_counter()
+        for file_id in sample:
+            store.get(file_id)
+        hot_get = (time.perf_counter() - start) / len(sample)
+        store.log.close()
+
+        for name in os.listdir(directory):
+            if name.endswith(".idx"):
+                os.remove(os.path.join(directory, name))
+        start = time.perf_counter()
+        store = ValueStore(capacity=args.records, log=ValueLog(directory))
+        replay = time.perf_counter() - start
+        assert len(store) == args.records
+        store.log.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        shutil.rmtree(directory)
+
+        # a running node never closes its store cleanly, it only gets the periodic maintenance pass
+        directory = tempfile.mkdtemp()
+        store = ValueStore(capacity=args.records, log=ValueLog(directory))
+        for i in range(args.records):
+            store.add(random_file(i))
+            if (i + 1) % args.maintain_every == 0:
+                store.maintain()
+        store.maintain()
+        store.log.close()
+        start = time.perf_counter()
+        store = ValueStore(capacity=args.records, log=ValueLog(directory))
+        maintained = time.perf_counter() - start
+        assert len(store) == args.records
+        store.log.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"{'records':>9} {'add us':>7} {'compact s':>10} {'warm start s':>13} {'maintained start s':>19} "
+          f"{'replay s':>9} {'cold get us':>12} {'hot get us':>11} {'MB':>6}")
+    print(f"{args.records:>9} {populate / args.records * 1e6:>7.2f} {compact:>10.2f} {warm:>13.3f} {maintained:>19.3f} "
+          f"{replay:>9.2f} {cold_get * 1e6:>12.2f} {hot_get * 1e6:>11.2f} {size / 1e6:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+from bucket_list import BucketList
+from value_store import ValueStore
+from file import File
+import argparse
+import random
+import time
+
+
+def random_files(n: int) -> list:
+    files = []
+    for _ in range(n):
+        file = File(random.getrandbits(160))
+        file.id = random.getrandbits(160)
+        file.filename = "file"
+        file.size = 0
+        files.append(file)
+    return files
+
+
+def bench_store(files: list, lookups: list, misses: list) -> tuple:
+    store = ValueStore(ttl=3600, capacity=len(files))
+    start = time.perf_counter()
+    for file in files:
+        store.add(file)
+    add = (time.perf_counter() - start) / len(files)
+
+    start = time.perf_counter()
+    for file_id in lookups:
+        assert store.get(file_id)
+    hit = (time.perf_counter() - start) / len(lookups)
+
+    start = time.perf_counter()
+    for file_id in misses:
+        store.get(file_id)
+    miss = (time.perf_counter() - start) / len(misses)
+
+    start = time.perf_counter()
+    expired = store.expire(time.time() + 7200)
+    expire = time.perf_counter() - start
+    assert expired == len(files) and not len(store)
+    return add, hit, miss, expire
+
+
+def bench_bucket_list(files: list, lookups: list, misses: list) -> tuple:
+    store = BucketList()
+    start = time.perf_counter()
+    for file in files:
+        store.add_node(0, file)
+    add = (time.perf_counter() - start) / len(files)
+
+    start = time.perf_counter()
+    for file_id in lookups:
+        store.find_node(file_id)
+    hit = (time.perf_counter() - start) / len(lookups)
+
+    start = time.perf_counter()
+    for file_id in misses:
+        store.find_node(file_id)
+    miss = (time.perf_counter() - start) / len(misses)
+    return add, hit, miss, float('nan')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--legacy-max', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print(f"{'store':>12} {'records':>9} {'add us':>8} {'hit us':>8} {'miss us':>8} {'expire all s':>13}")
+    for n in args.records:
+        files = random_files(n)
+        lookups = [random.choice(files).id for _ in range(args.lookups)]
+        misses = [random.getrandbits(160) for _ in range(args.lookups)]
+        stores = [("ValueStore", bench_store)]
+        if n <= args.legacy_max:
+            stores.insert(0, ("BucketList", bench_bucket_list))
+        for name, bench in stores:
+            add, hit, miss, expire = bench(files, lookups, misses)
+            print(f"{name:>12} {n:>9} {add * 1e6:>8.2f} {hit * 1e6:>8.2f} {miss * 1e6:>8.2f} {expire:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+from base64 import b64encode, b64decode
+from utils import MsgType, sha1_id
+from Crypto.Cipher import AES
+from wire import Frame
+from file import File
+import argparse
+import random
+import json
+import time
+import ssl
+import wire
+
+KEY = ssl.RAND_bytes(32)
+
+
+def legacy_encode(header: str, msg: str) -> bytes:
+    cipher = AES.new(KEY, AES.MODE_GCM)
+    cipher.update(header.encode())
+    ciphertext, tag = cipher.encrypt_and_digest(msg.encode())
+    json_k = ['nonce', 'header', 'ciphertext', 'tag']
+    json_v = [b64encode(x).decode('utf-8') for x in [cipher.nonce, header.encode(), ciphertext, tag]]
+    return b64encode(json.dumps(dict(zip(json_k, json_v))).encode())
+
+
+def legacy_decode(data: bytes) -> str:
+    b64 = json.loads(b64decode(data))
+    jv = {k: b64decode(b64[k]) for k in ['nonce', 'header', 'ciphertext', 'tag']}
+    cipher = AES.new(KEY, AES.MODE_GCM, nonce=jv['nonce'])
+    cipher.update(jv['header'])
+    return cipher.decrypt_and_verify(jv['ciphertext'], jv['tag']).decode()
+
+
+def binary_encode(header: MsgType, payload: bytes) -> bytes:
+    return wire.seal(Frame(header, 9000, wire.new_msg_id(), bytes(8)), KEY, payload)
+
+
+def binary_decode(data: bytes) -> bytes:
+    return wire.unseal(wire.decode(data), KEY)
+
+
+def messages() -> dict:
+    contacts = [(f"10.0.{random.randrange(256)}.{random.randrange(256)}", random.randrange(1024, 65536)) for _ in range(20)]
+    file = File()
+    file.id = sha1_id(b"contents")
+    file.owner = sha1_id(b"owner")
+    file.filename = "holiday_photos_2023.tar.gz"
+    file.size = 48213
+    file.published_on = time.time()
+    return {
+        "FindNode reply": (
+            (MsgType.Found.value, json.dumps([(addr, port, time.time()) for addr, port in contacts])),
+            (MsgType.Found, wire.pack_contacts(contacts)),
+        ),
+        "Store request": (
+            (MsgType.Store.value, json.dumps({"msg": json.dumps(file.as_tuple()), "port": 9000})),
+            (MsgType.Store, wire.pack_file(file)),
+        ),
+        "Ping request": (
+            (MsgType.Ping.value, json.dumps({"msg": "", "port": 9000})),
+            (MsgType.Ping, b""),
+        ),
+    }
+
+
+def timed(fn, arg, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(*arg)
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'message':>15} {'format':>7} {'bytes':>6} {'encode us':>10} {'decode us':>10}")
+    for name, (legacy, binary) in messages().items():
+        encoded = legacy_encode(*legacy)
+        print(f"{name:>15} {'json':>7} {len(encoded):>6} {timed(legacy_encode, legacy, args.rounds) * 1e6:>10.2f} "
+              f"{timed(legacy_decode, (encoded,), args.rounds) * 1e6:>10.2f}")
+        encoded = binary_encode(*binary)
+        print(f"{name:>15} {'binary':>7} {len(encoded):>6} {timed(binary_encode, binary, args.rounds) * 1e6:>10.2f} "
+              f"{timed(binary_decode, (encoded,), args.rounds) * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,6 @@ from typing import Optional, List, Tuple
 from utils import quick_sort, Config
 from kbucket import KBucket
 from node import Node
-import random
 
 
 class BucketList:
@@ -62,13 +61,13 @@ class BucketList:
             k1, k2 = bucket.split()
 
             self.delete_bucket(bucket)
-            left_distance = int(k1.root.id, 16) ^ int(new_node.id, 16)
-            right_distance = int(k2.root.id, 16) ^ int(new_node.id, 16)
+            left_distance = k1.median().id ^ new_node.id
+            right_distance = k2.median().id ^ new_node.id
             k1.add(new_node) if left_distance < right_distance else k2.add(new_node)
             self.insert(k1)
             self.insert(k2)
 
-    def find_node(self, key: str) -> Optional[Node]:
+    def find_node(self, key: int) -> Optional[Node]:
         bucket = self.find_closest(key)
         if bucket:
             node = bucket.find_node(key)
@@ -86,26 +85,26 @@ class BucketList:
             self.append(new_bucket)
             return
 
-        if new_bucket.root.id > buckets[-1].root.id:
+        if new_bucket.median().id > buckets[-1].median().id:
             self.append(new_bucket)
             return
 
-        if new_bucket.root.id < buckets[0].root.id:
+        if new_bucket.median().id < buckets[0].median().id:
             self.prepend(new_bucket)
             return
 
         for i in range(len(buckets)-1):
-            if buckets[i].root.id < new_bucket.root.id < buckets[i + 1].root.id:
-                self.add_after_node(buckets[i].root.id, new_bucket)
+            if buckets[i].median().id < new_bucket.median().id < buckets[i + 1].median().id:
+                self.add_after_node(buckets[i].median().id, new_bucket)
                 return
 
-    def add_after_node(self, key: str, new_bucket: KBucket) -> None:
+    def add_after_node(self, key: int, new_bucket: KBucket) -> None:
         current = self.head
         while current:
-            if current.next == self.head and current.root.id == key:
+            if current.next == self.head and current.median().id == key:
                 self.append(new_bucket)
                 return
-            elif current.root.id == key:
+            elif current.median().id == key:
                 nxt = current.next
                 current.next = new_bucket
                 new_bucket.next = nxt
@@ -114,13 +113,13 @@ class BucketList:
                 return
             current = current.next
 
-    def add_before_node(self, key: str, new_bucket: KBucket) -> None:
+    def add_before_node(self, key: int, new_bucket: KBucket) -> None:
         current = self.head
         while current:
-            if current.prev == self.head and current.root.id == key:
+            if current.prev == self.head and current.median().id == key:
                 self.prepend(new_bucket)
                 return
-            elif current.root.id == key:
+            elif current.median().id == key:
                 prev = current.prev
                 prev.next = new_bucket
                 current.prev = new_bucket
@@ -154,35 +153,35 @@ class BucketList:
             if current == self.head:
                 return
 
-    def find_bucket(self, target: str) -> Optional[KBucket]:
+    def find_bucket(self, target: int) -> Optional[KBucket]:
         current = self.head
-        if current.root.id == target:
+        if current.median().id == target:
             return current
 
-        left_distance = int(current.prev.root.id, 16) ^ int(target, 16)
-        right_distance = int(current.next.root.id, 16) ^ int(target, 16)
+        left_distance = current.prev.median().id ^ target
+        right_distance = current.next.median().id ^ target
         if left_distance < right_distance:
             while current:
-                if current.root.id == target:
+                if current.median().id == target:
                     return current
                 current = current.prev
                 if current == self.head:
                     break
         else:
             while current:
-                if current.root.id == target:
+                if current.median().id == target:
                     return current
                 current = current.next
                 if current == self.head:
                     break
         return
 
-    def find_closest(self, target: str) -> Optional[KBucket]:
+    def find_closest(self, target: int) -> Optional[KBucket]:
         current = self.head
         while current:
-            left_distance = int(current.root.id, 16) ^ int(target, 16)
-            right_distance = int(current.next.root.id, 16) ^ int(target, 16)
-            if int(current.root.id, 16) < int(target, 16) < int(current.next.root.id, 16):
+            left_distance = current.median().id ^ target
+            right_distance = current.next.median().id ^ target
+            if current.median().id < target < current.next.median().id:
                 if left_distance < right_distance:
                     return current
                 return current.next
@@ -211,8 +210,8 @@ class BucketList:
         current = self.head
         seen = dict()
         while current:
-            if current.root.id not in seen:
-                seen[current.root.id] = 1
+            if current.median().id not in seen:
+                seen[current.median().id] = 1
                 current = current.next
             else:
                 nxt = current.next
@@ -257,11 +256,9 @@ class BucketList:
 
         bucketlist = BucketList()
         for i in range(0, len(nodes), self.k_nodes):
-            chunk = nodes[i:i+self.k_nodes]
-            random.shuffle(chunk)
             bucket = KBucket()
-            for node in chunk:
-                bucket.add(node.copy())
+            for node in nodes[i:i+self.k_nodes]:
+                bucket.add(node)
             bucketlist.append(bucket)
         return bucketlist
 
@@ -289,7 +286,7 @@ class BucketList:
         current = self.head
         tuples = []
         while current:
-            tuples += [node.as_tuple() for node in current.preorder()]
+            tuples += [node.as_tuple() for node in current.inorder()]
             current = current.next
             if current == self.head:
                 break
@@ -299,7 +296,7 @@ class BucketList:
     def print_list(self) -> None:
         current = self.head
         while current:
-            print(current.root.id)
+            print(current.median().hex_id)
             current = current.next
             if current == self.head:
                 break
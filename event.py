@@ -8,4 +8,3 @@ class Event:
         self.hash:      Optional[str] = None
         self.prev_hash:  Optional[str] = None
         self.nonce:     Optional[int] = None
-        self.next:      Optional[Event] = None
@@ -0,0 +1,268 @@
+from typing import Optional, Dict, List, Iterator, Tuple
+from utils import get_target_range, id_to_hex, Config
+from miner import Miner, event_hash
+from event import Event
+from array import array
+import threading
+import struct
+import mmap
+import os
+
+# record length, hash, previous hash, nonce, signature length | signature, data
+RECORD = struct.Struct(">I20s20sQH")
+# log position, indexed events, tail segment, tail offset
+CHECKPOINT = struct.Struct(">QQQQ")
+NO_HASH = bytes(20)
+OFFSET_BITS = 40
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+class Segment:
+    def __init__(self, path: str):
+        self.path:  str = path
+        self.file   = open(path, 'ab')
+        self.size:  int = self.file.tell()
+        self.map:   Optional[mmap.mmap] = None
+
+    def append(self, record: bytes) -> int:
+        offset = self.size
+        self.file.write(record)
+        self.size += len(record)
+        return offset
+
+    def sync(self) -> None:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def truncate(self, size: int) -> None:
+        self.file.flush()
+        self.file.truncate(size)
+        self.size = size
+        if self.map:
+            self.map.close()
+            self.map = None
+
+    def view(self, end: int) -> mmap.mmap:
+        if not self.map or len(self.map) < end:
+            self.file.flush()
+            if self.map:
+                self.map.close()
+            with open(self.path, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def close(self) -> None:
+        self.file.close()
+        if self.map:
+            self.map.close()
+            self.map = None
+
+
+class EventLog:
+    def __init__(self, directory: str, miner: Optional[Miner] = None,
+                 segment_size: int = Config.SegmentSize.value, checkpoint_every: int = Config.CheckpointEvery.value):
+        self.directory:         str = directory
+        self.segment_size:      int = segment_size
+        self.checkpoint_every:  int = checkpoint_every
+        self.difficulty:        int = 3
+        self.miner:             Miner = miner or Miner()
+        self.segments:          List[Segment] = []
+        self.index:             Dict[int, int] = {}
+        self.overflow:          Dict[bytes, int] = {}
+        self.unindexed:         array = array('Q')
+        self.tail:              Optional[Event] = None
+        self.tail_location:     Optional[int] = None
+        self.count:             int = 0
+        self.lock:              threading.RLock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, event_hash: str) -> bool:
+        with self.lock:
+            return self.locate(bytes.fromhex(event_hash)) is not None
+
+    def segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{number:08d}.log")
+
+    @staticmethod
+    def hash_data(event: Event) -> bytes:
+        hash_data = event.data.encode()
+        hash_data += event.signature
+        if event.prev_hash:
+            hash_data += event.prev_hash.encode()
+        else:
+            hash_data += b"0"*40
+        return hash_data
+
+    def mine(self, event: Event) -> None:
+        nonce, h = self.miner.mine(self.hash_data(event), self.difficulty)
+        event.hash = id_to_hex(h)
+        event.nonce = nonce
+
+    def verify(self, event: Event) -> bool:
+        if event.nonce is None or event.hash is None:
+            return False
+        h = event_hash(self.hash_data(event), event.nonce)
+        min_target, max_target = get_target_range(self.difficulty, 40)
+        return min_target < h < max_target and id_to_hex(h) == event.hash
+
+    def add(self, event: Event) -> None:
+        with self.lock:
+            event.prev_hash = self.tail.hash if self.tail else None
+            self.mine(event)
+            self.append(event)
+            self.segments[-1].file.flush()
+
+    def last(self) -> Optional[Event]:
+        return self.tail
+
+    def get(self, event_hash: str) -> Optional[Event]:
+        with self.lock:
+            location = self.locate(bytes.fromhex(event_hash))
+            return self.read(location)[0] if location is not None else None
+
+    def append(self, event: Event) -> None:
+        signature = event.signature
+        data = event.data.encode()
+        prev_hash = bytes.fromhex(event.prev_hash) if event.prev_hash else NO_HASH
+        record = RECORD.pack(RECORD.size + len(signature) + len(data), bytes.fromhex(event.hash),
+                             prev_hash, event.nonce, len(signature)) + signature + data
+
+        if not self.segments or self.segments[-1].size + len(record) > self.segment_size:
+            if self.segments:
+                self.segments[-1].sync()
+            self.segments.append(Segment(self.segment_path(len(self.segments))))
+        offset = self.segments[-1].append(record)
+        location = (len(self.segments) - 1) << OFFSET_BITS | offset
+        self.insert(bytes.fromhex(event.hash), location)
+        self.unindexed.extend((int.from_bytes(bytes.fromhex(event.hash)[:8], byteorder='big'), location))
+        self.tail = event
+        self.tail_location = location
+        self.count += 1
+        if len(self.unindexed) // 2 >= self.checkpoint_every:
+            self.checkpoint()
+
+    def insert(self, raw_hash: bytes, location: int) -> None:
+        key = int.from_bytes(raw_hash[:8], byteorder='big')
+        existing = self.index.setdefault(key, location)
+        if existing != location:
+            self.overflow[raw_hash] = location
+
+    def locate(self, raw_hash: bytes) -> Optional[int]:
+        location = self.overflow.get(raw_hash)
+        if location is not None:
+            return location
+        location = self.index.get(int.from_bytes(raw_hash[:8], byteorder='big'))
+        if location is None:
+            return None
+        segment = self.segments[location >> OFFSET_BITS]
+        offset = location & OFFSET_MASK
+        view = segment.view(offset + RECORD.size)
+        return location if view[offset + 4:offset + 24] == raw_hash else None
+
+    def read(self, location: int) -> Tuple[Event, int]:
+        segment = self.segments[location >> OFFSET_BITS]
+        offset = location & OFFSET_MASK
+        view = segment.view(offset + RECORD.size)
+        length, raw_hash, prev_hash, nonce, sig_length = RECORD.unpack_from(view, offset)
+        view = segment.view(offset + length)
+        start = offset + RECORD.size
+        event = Event(view[start + sig_length:offset + length].decode(), view[start:start + sig_length])
+        event.hash = raw_hash.hex()
+        event.prev_hash = prev_hash.hex() if prev_hash != NO_HASH else None
+        event.nonce = nonce
+        return event, length
+
+    def scan(self, segment_number: int, offset: int) -> Iterator[Tuple[Event, int, int]]:
+        for number in range(segment_number, len(self.segments)):
+            segment = self.segments[number]
+            while offset + RECORD.size <= segment.size:
+                length = RECORD.unpack_from(segment.view(offset + RECORD.size), offset)[0]
+                if length < RECORD.size or offset + length > segment.size:
+                    # torn write at the end of the log
+                    break
+                event, length = self.read(number << OFFSET_BITS | offset)
+                yield event, number << OFFSET_BITS | offset, length
+                offset += length
+            offset = 0
+
+    def __iter__(self) -> Iterator[Event]:
+        with self.lock:
+            for event, _, _ in self.scan(0, 0):
+                yield event
+
+    def checkpoint(self) -> None:
+        with self.lock:
+            if self.segments:
+                self.segments[-1].sync()
+            with open(os.path.join(self.directory, "index"), 'ab') as f:
+                self.unindexed.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+                indexed = f.tell() // 16
+            self.unindexed = array('Q')
+            tail = self.tail_location if self.tail_location is not None else (1 << 64) - 1
+            position = len(self.segments) - 1 << OFFSET_BITS | self.segments[-1].size if self.segments else 0
+            path = os.path.join(self.directory, "checkpoint")
+            with open(path + ".tmp", 'wb') as f:
+                f.write(CHECKPOINT.pack(position, indexed, tail >> OFFSET_BITS, tail & OFFSET_MASK))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+
+    def load(self) -> None:
+        number = 0
+        while os.path.exists(self.segment_path(number)):
+            self.segments.append(Segment(self.segment_path(number)))
+            number += 1
+
+        position, indexed, tail = 0, 0, None
+        try:
+            with open(os.path.join(self.directory, "checkpoint"), 'rb') as f:
+                position, indexed, tail_segment, tail_offset = CHECKPOINT.unpack(f.read())
+            if tail_segment < len(self.segments):
+                tail = tail_segment << OFFSET_BITS | tail_offset
+        except (FileNotFoundError, struct.error):
+            pass
+
+        index_path = os.path.join(self.directory, "index")
+        if os.path.exists(index_path) and os.path.getsize(index_path) > indexed * 16:
+            os.truncate(index_path, indexed * 16)
+        if indexed:
+            entries = array('Q')
+            with open(index_path, 'rb') as f:
+                entries.fromfile(f, indexed * 2)
+            self.index = dict(zip(entries[0::2], entries[1::2]))
+            self.count = indexed
+            if len(self.index) != indexed:
+                self.index = {}
+                for location in entries[1::2]:
+                    self.insert(bytes.fromhex(self.read(location)[0].hash), location)
+        if tail is not None:
+            self.tail, _ = self.read(tail)
+            self.tail_location = tail
+
+        valid = (position >> OFFSET_BITS, position & OFFSET_MASK)
+        for event, location, length in self.scan(*valid):
+            raw_hash = bytes.fromhex(event.hash)
+            self.insert(raw_hash, location)
+            self.unindexed.extend((int.from_bytes(raw_hash[:8], byteorder='big'), location))
+            self.tail = event
+            self.tail_location = location
+            self.count += 1
+            valid = (location >> OFFSET_BITS, (location & OFFSET_MASK) + length)
+        if self.segments:
+            # drop a torn record left at the end of the log by a crash
+            end = valid[1] if valid[0] == len(self.segments) - 1 else 0
+            if self.segments[-1].size > end:
+                self.segments[-1].truncate(end)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.segments:
+                self.checkpoint()
+            for segment in self.segments:
+                segment.close()
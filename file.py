@@ -1,28 +1,30 @@
 from typing import BinaryIO, TextIO, Union, Optional, Tuple
+from utils import sha1_id, id_to_hex, hex_to_id
 from node import Node
-import hashlib
 import time
 
 
 class File(Node):
-    def __init__(self, peer_id: Optional[str] = None, file: Optional[Union[BinaryIO, TextIO]] = None):
+    def __init__(self, peer_id: Optional[int] = None, file: Optional[Union[BinaryIO, TextIO]] = None):
         super().__init__()
-        self.owner:         Optional[str]   = peer_id
+        self.owner:         Optional[int]   = peer_id
         self.filename:      Optional[str]   = file.name if file else None
         self.size:          Optional[int]   = file.__sizeof__() if file else None
         self.published_on:  Optional[float] = time.time()
         if file:
             contents = file.read()
             if isinstance(contents, bytes):
-                self.id = hashlib.sha1(contents).hexdigest()
+                self.id = sha1_id(contents)
             elif isinstance(contents, str):
-                self.id = hashlib.sha1(contents.encode()).hexdigest()
+                self.id = sha1_id(contents.encode())
 
     def as_tuple(self) -> Tuple[str, str, str, int, float]:
-        return self.id, self.owner, self.filename, self.size, self.published_on
+        return self.hex_id, id_to_hex(self.owner), self.filename, self.size, self.published_on
 
     def from_tuple(self, file_tuple: Tuple[str, str, str, int, float]) -> None:
-        self.id, self.owner, self.filename, self.size, self.published_on = file_tuple
+        file_id, owner, self.filename, self.size, self.published_on = file_tuple
+        self.id = hex_to_id(file_id)
+        self.owner = hex_to_id(owner)
 
     def copy(self):
         file = File()
@@ -0,0 +1,20 @@
+from Crypto.PublicKey import ECC
+from typing import Tuple
+from utils import Config
+import hashlib
+
+
+def generate_key_pair() -> Tuple[ECC.EccKey, bytes]:
+    private_key = ECC.generate(curve=Config.Curve.value)
+    point = private_key.pointQ
+    return private_key, int(point.x).to_bytes(32, byteorder='big') + int(point.y).to_bytes(32, byteorder='big')
+
+
+def derive_key(private_key: ECC.EccKey, remote_pub_key: bytes) -> bytes:
+    if len(remote_pub_key) != 64:
+        raise ValueError("Invalid public key length")
+    remote = ECC.construct(curve=Config.Curve.value,
+                           point_x=int.from_bytes(remote_pub_key[:32], byteorder='big'),
+                           point_y=int.from_bytes(remote_pub_key[32:], byteorder='big'))
+    shared_secret = (remote.pointQ * private_key.d).x
+    return hashlib.sha256(int(shared_secret).to_bytes(32, byteorder='big')).digest()
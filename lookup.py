@@ -0,0 +1,76 @@
+from typing import Optional, List, Dict, Set, Tuple, Callable, Awaitable, Iterable
+from utils import Config
+from node import Node
+import asyncio
+import bisect
+
+
+class Lookup:
+    def __init__(self, target: int, query: Callable[[Node], Awaitable[Optional[List[Node]]]],
+                 k_nodes: int = Config.KNodes.value, alpha: int = Config.Alpha.value):
+        self.target:    int = target
+        self.query:     Callable[[Node], Awaitable[Optional[List[Node]]]] = query
+        self.k_nodes:   int = k_nodes
+        self.alpha:     int = alpha
+        self.shortlist: List[Tuple[int, int]] = []
+        self.nodes:     Dict[int, Node] = {}
+        self.depth:     Dict[int, int] = {}
+        self.queried:   Set[int] = set()
+        self.responded: Set[int] = set()
+        self.failed:    Set[int] = set()
+        self.rpcs:      int = 0
+
+    def add(self, nodes: Iterable[Node], depth: int) -> None:
+        for node in nodes:
+            if node.id not in self.nodes:
+                self.nodes[node.id] = node
+                self.depth[node.id] = depth
+                bisect.insort(self.shortlist, (node.distance(self.target), node.id))
+
+    def closest(self) -> List[int]:
+        closest = []
+        for _, node_id in self.shortlist:
+            if node_id not in self.failed:
+                closest.append(node_id)
+                if len(closest) == self.k_nodes:
+                    break
+        return closest
+
+    def rank(self, node_id: int) -> Tuple[int, float]:
+        # contacts in the same distance band count as tied, so the faster one goes first
+        srtt = getattr(self.nodes[node_id], 'srtt', None)
+        return (node_id ^ self.target).bit_length(), srtt if srtt is not None else float('inf')
+
+    def hops(self) -> int:
+        return max((self.depth[node_id] + 1 for node_id in self.responded), default=0)
+
+    async def run(self, seeds: Iterable[Node]) -> List[Node]:
+        self.add(seeds, 0)
+        in_flight: Dict[asyncio.Task, int] = {}
+        try:
+            while True:
+                closest = self.closest()
+                if all(node_id in self.responded for node_id in closest):
+                    break
+                for node_id in sorted((node_id for node_id in closest if node_id not in self.queried), key=self.rank):
+                    if len(in_flight) >= self.alpha:
+                        break
+                    self.queried.add(node_id)
+                    self.rpcs += 1
+                    in_flight[asyncio.ensure_future(self.query(self.nodes[node_id]))] = node_id
+                if not in_flight:
+                    break
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node_id = in_flight.pop(task)
+                    contacts = None if task.cancelled() or task.exception() else task.result()
+                    if contacts is None:
+                        self.failed.add(node_id)
+                        continue
+                    self.responded.add(node_id)
+                    self.add(contacts, self.depth[node_id] + 1)
+        finally:
+            for task in in_flight:
+                task.cancel()
+        return [self.nodes[node_id] for node_id in self.closest() if node_id in self.responded]
@@ -53,5 +53,10 @@ if __name__ == '__main__':
     args = parser.parse_args()
     beacon = Beacon(args.port, args.boot_port)
     beacon.start()
-    interact(beacon)
+    try:
+        interact(beacon)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        beacon.stop()
 
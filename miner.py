@@ -0,0 +1,82 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Tuple
+from utils import get_target_range, Config
+import multiprocessing
+import threading
+import hashlib
+import struct
+import time
+import os
+
+NONCE = struct.Struct(">Q")
+
+
+def event_hash(hash_data: bytes, nonce: int) -> int:
+    return int.from_bytes(hashlib.sha1(hash_data + NONCE.pack(nonce)).digest(), byteorder='big')
+
+
+def search(hash_data: bytes, difficulty: int, start: int, stop: int) -> Optional[Tuple[int, int]]:
+    min_target, max_target = get_target_range(difficulty, Config.IdBits.value // 4)
+    prefix = hashlib.sha1(hash_data)
+    for nonce in range(start, stop):
+        attempt = prefix.copy()
+        attempt.update(NONCE.pack(nonce))
+        h = int.from_bytes(attempt.digest(), byteorder='big')
+        if min_target < h < max_target:
+            return nonce, h
+    return None
+
+
+class Miner:
+    def __init__(self, workers: Optional[int] = None, chunk: int = Config.MineChunk.value):
+        self.workers:   int = workers or os.cpu_count() or 1
+        self.chunk:     int = chunk
+        self.pool:      Optional[ProcessPoolExecutor] = None
+        self.lock:      threading.Lock = threading.Lock()
+        self.hashes:    int = 0
+        self.elapsed:   float = 0.0
+        self.hash_rate: float = 0.0
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if not self.pool:
+                # spawn, not fork: the beacon process is full of threads and an event loop
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self.pool
+
+    def mine(self, hash_data: bytes, difficulty: int) -> Tuple[int, int]:
+        pool = self.executor()
+        start = time.perf_counter()
+        next_nonce = 0
+        running = set()
+        solution = None
+        hashes = 0
+        try:
+            while not solution:
+                while len(running) < self.workers * 2:
+                    running.add(pool.submit(search, hash_data, difficulty, next_nonce, next_nonce + self.chunk))
+                    next_nonce += self.chunk
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result:
+                        solution = min(solution, result) if solution else result
+                        hashes += result[0] % self.chunk + 1
+                    else:
+                        hashes += self.chunk
+        finally:
+            for future in running:
+                future.cancel()
+
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.hashes += hashes
+            self.elapsed += elapsed
+            self.hash_rate = hashes / elapsed if elapsed else 0.0
+        return solution
+
+    def shutdown(self) -> None:
+        with self.lock:
+            if self.pool:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
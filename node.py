@@ -1,15 +1,19 @@
 from typing import Optional, Tuple, Any
-from utils import MsgType
+from utils import MsgType, id_to_hex
 
 
 class Node:
+    __slots__ = ('id',)
+
     def __init__(self):
-        self.id:    Optional[str]  = None
-        self.left:  Optional[Node] = None
-        self.right: Optional[Node] = None
+        self.id:    Optional[int]  = None
 
-    def perform_key_exchange(self, port) -> bool:
-        pass
+    @property
+    def hex_id(self) -> str:
+        return id_to_hex(self.id)
+
+    def distance(self, key: int) -> int:
+        return self.id ^ key
 
     def send(self, port: int, header: Optional[MsgType] = "", msg: Optional[str] = "") -> None:
         pass
@@ -17,10 +21,10 @@ class Node:
     def ping(self, port: int):
         pass
 
-    def find_node(self, target: str, port: int) -> Optional[Tuple[str, str, str]]:
+    def find_node(self, target: int, port: int) -> Optional[Tuple[str, str, str]]:
         pass
 
-    def find_value(self, target: str, port: int) -> Optional[Tuple[str, str, str]]:
+    def find_value(self, target: int, port: int) -> Optional[Tuple[str, str, str]]:
         pass
 
     def get_value(self, filename: str, port: int) -> Optional[Tuple[str, str, str]]:
@@ -1,101 +1,42 @@
-from base64 import b64encode, b64decode
 from typing import Optional, Tuple
-from utils import get_target_range, MsgType, Config
-from Crypto.Util import number
-from Crypto.Cipher import AES
+from utils import MsgType, sha1_id, local_address
+from transport import Transport
 from node import Node
 from file import File
-import hashlib
-import socket
-import struct
+import random
 import time
-import json
-import ssl
+import wire
+
+INITIAL_RTO = 1.0
+MIN_RTO = 0.2
+MAX_RTO = 10.0
+RTO_JITTER = 0.25
 
 
 class Peer(Node):
-    def __init__(self, port: int):
+    __slots__ = ('addr', 'port', 'difficulty', 'joined', 'last_seen', 'srtt', 'rttvar', 'rto')
+
+    def __init__(self, port: int, addr: Optional[str] = None):
         super().__init__()
-        self.addr:          str = socket.gethostbyname(socket.gethostname())
+        self.addr:          str = addr or local_address()
         self.port:          int = port
-        self.id:            str = hashlib.sha1(self.addr.encode()+bytes(self.port)).hexdigest()
+        self.id:            int = sha1_id(self.addr.encode()+bytes(self.port))
         self.difficulty:    int = 0
-        self.buffer:        int = Config.BufferSize.value
-        self.aes_key:       Optional[bytes] = None
-        self.key_length:    int = Config.KeyLength.value
-        self.generator:     int = Config.Generator.value
-        self.priv_key:      Optional[int] = None
-        self.pub_key:       Optional[int] = None
-        self.prime:         Optional[int] = None
         now = time.time()
         self.joined:        float = now
         self.last_seen:     float = now
-        self.sock: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.settimeout(5)
-
-    def generate_private_key(self) -> int:
-        return int.from_bytes(ssl.RAND_bytes(self.key_length), byteorder='big')
-
-    def generate_public_key(self) -> int:
-        return pow(self.generator, self.priv_key, self.prime)
-
-    def get_key(self, remote_pub_key: int) -> bytes:
-        shared_secret = pow(remote_pub_key, self.priv_key, self.prime)
-        shared_secret_bytes = shared_secret.to_bytes(shared_secret.bit_length() // 8 + 1, byteorder="big")
-        return hashlib.sha256(shared_secret_bytes).digest()
-
-    def perform_key_exchange(self, port: int) -> bool:
-        try:
-            if not self.prime:
-                self.prime = number.getPrime(2048, ssl.RAND_bytes)
-            self.priv_key = self.generate_private_key()
-            self.pub_key = self.generate_public_key()
-            msg = {
-                "nonce": self.calculate_nonce(),
-                "prime": self.prime,
-                "pub_key": self.pub_key,
-                "port": port
-            }
-            encoded_msg = b64encode(json.dumps(msg).encode())
-            msg_size = struct.pack(">L", len(encoded_msg))
-            self.sock.sendto(msg_size, self.address())
-
-            while encoded_msg:
-                self.sock.sendto(encoded_msg[:self.buffer], self.address())
-                encoded_msg = encoded_msg[self.buffer:]
-
-            response = b""
-            msg_size = struct.calcsize(">L")
-            while len(response) < msg_size:
-                data, _ = self.sock.recvfrom(self.buffer)
-                response += data
-
-            packed_msg_size = response[:msg_size]
-            response = response[msg_size:]
-            msg_size = struct.unpack(">L", packed_msg_size)[0]
-            while len(response) < msg_size:
-                data, _ = self.sock.recvfrom(self.buffer)
-                response += data
-
-            remote_pub_key = int.from_bytes(response, byteorder='big')
-            self.aes_key = self.get_key(remote_pub_key)
-
-            return True
-        except (TimeoutError, socket.timeout, socket.error):
-            return False
-
-    def calculate_nonce(self) -> int:
-        min_target, max_target = get_target_range(self.difficulty, len(self.id))
-        peer_id = int(self.id, 16).to_bytes(len(self.id), byteorder='big')
-        nonce = 0
-        while True:
-            h = int.from_bytes(hashlib.sha1(peer_id + bytes(nonce)).digest(), byteorder='big')
-            if min_target < h < max_target:
-                return nonce
-            nonce += 1
+        self.srtt:          Optional[float] = None
+        self.rttvar:        float = 0.0
+        self.rto:           float = INITIAL_RTO
 
     def copy(self):
-        return Peer(self.port)
+        peer = Peer(self.port, self.addr)
+        peer.joined = self.joined
+        peer.last_seen = self.last_seen
+        peer.srtt = self.srtt
+        peer.rttvar = self.rttvar
+        peer.rto = self.rto
+        return peer
 
     def address(self) -> Tuple[str, int]:
         return self.addr, self.port
@@ -103,79 +44,82 @@ class Peer(Node):
     def as_tuple(self) -> Tuple[str, int, float]:
         return self.addr, self.port, self.last_seen
 
-    def send(self, port: int, header: Optional[MsgType] = "", msg: Optional[str] = "") -> bool:
-        response = self.perform_key_exchange(port)
-        if response:
-            cipher = AES.new(self.aes_key, AES.MODE_GCM)
-            cipher.update(header.encode())
-            msg = json.dumps({"msg": msg, "port": port})
-            ciphertext, tag = cipher.encrypt_and_digest(msg.encode())
-            json_k = ['nonce', 'header', 'ciphertext', 'tag']
-            json_v = [b64encode(x).decode('utf-8') for x in [cipher.nonce, header.encode(), ciphertext, tag]]
-            encoded_msg = b64encode(json.dumps(dict(zip(json_k, json_v))).encode())
-            msg_size = struct.pack(">L", len(encoded_msg))
-            self.sock.sendto(msg_size, self.address())
-
-            while encoded_msg:
-                self.sock.sendto(encoded_msg[:self.buffer], self.address())
-                encoded_msg = encoded_msg[self.buffer:]
-            return True
-        return False
-
-    def receive(self) -> Optional[Tuple[str, str, Tuple[str, int]]]:
-        try:
-            response = b""
-            msg_size = struct.calcsize(">L")
-            while len(response) < msg_size:
-                data, _ = self.sock.recvfrom(self.buffer)
-                response += data
-
-            packed_msg_size = response[:msg_size]
-            response = response[msg_size:]
-            msg_size = struct.unpack(">L", packed_msg_size)[0]
-            addr = None
-            while len(response) < msg_size:
-                data, addr = self.sock.recvfrom(self.buffer)
-                response += data
-
-            b64 = json.loads(b64decode(response))
-            json_k = ['nonce', 'header', 'ciphertext', 'tag']
-            jv = {k: b64decode(b64[k]) for k in json_k}
-            cipher = AES.new(self.aes_key, AES.MODE_GCM, nonce=jv['nonce'])
-            cipher.update(jv['header'])
-
-            header = jv['header'].decode()
-            msg = cipher.decrypt_and_verify(jv['ciphertext'], jv['tag']).decode()
-
-        except socket.error as e:
-            print(e)
-            return None
-        return header, msg, addr
-
-    def send_recv(self, port: int, header: Optional[MsgType] = "", msg: Optional[str] = "") -> Optional[Tuple[str, str, Tuple[str, int]]]:
-        self.send(port, header, msg)
-        return self.receive()
+    def observe_rtt(self, sample: float) -> None:
+        # RFC 6298 smoothing, alpha = 1/8, beta = 1/4
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - sample)
+            self.srtt = 0.875 * self.srtt + 0.125 * sample
+        self.rto = min(MAX_RTO, max(MIN_RTO, self.srtt + 4 * self.rttvar))
+
+    def backoff(self) -> None:
+        self.rto = min(MAX_RTO, self.rto * 2)
+
+    def timeout(self) -> float:
+        return self.rto * random.uniform(1, 1 + RTO_JITTER)
+
+    async def send_async(self, port: int, header: MsgType, payload: bytes = b"") -> bool:
+        return await Transport.bound(port).send(self, header, payload) is not None
+
+    async def send_recv_async(self, port: int, header: MsgType, payload: bytes = b"") -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return await Transport.bound(port).send_recv(self, header, payload)
+
+    async def ping_async(self, port: int) -> bool:
+        response = await self.send_recv_async(port, MsgType.Ping)
+        return bool(response) and response[0] == MsgType.Pong
+
+    async def probe_async(self, port: int) -> bool:
+        return await Transport.bound(port).probe(self)
+
+    async def find_node_async(self, target: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return await self.send_recv_async(port, MsgType.FindNode, wire.pack_id(target))
+
+    async def store_async(self, file: File, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return await self.send_recv_async(port, MsgType.Store, wire.pack_file(file))
+
+    async def find_value_async(self, target: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return await self.send_recv_async(port, MsgType.FindValue, wire.pack_id(target))
+
+    async def get_value_async(self, file_id: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return await self.send_recv_async(port, MsgType.GetValue, wire.pack_id(file_id))
+
+    async def get_chunk_async(self, file_id: int, index: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return await self.send_recv_async(port, MsgType.GetChunk, wire.pack_chunk_request(file_id, index))
+
+    async def get_range_async(self, file_id: int, offset: int, length: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return await self.send_recv_async(port, MsgType.GetRange, wire.pack_range_request(file_id, offset, length))
+
+    def send(self, port: int, header: MsgType, payload: bytes = b"") -> bool:
+        return Transport.bound(port).call(self.send_async(port, header, payload))
+
+    def send_recv(self, port: int, header: MsgType, payload: bytes = b"") -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return Transport.bound(port).call(self.send_recv_async(port, header, payload))
 
     def ping(self, port: int) -> bool:
-        try:
-            response = self.send_recv(port, MsgType.Ping)
-            if response and response[0] == MsgType.Pong:
-                return True
-        except (TimeoutError, socket.timeout, socket.error):
-            return False
-        return False
+        return Transport.bound(port).call(self.ping_async(port))
+
+    def probe(self, port: int) -> bool:
+        return Transport.bound(port).call(self.probe_async(port))
+
+    def find_node(self, target: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return Transport.bound(port).call(self.find_node_async(target, port))
+
+    def store(self, file: File, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return Transport.bound(port).call(self.store_async(file, port))
 
-    def find_node(self, target: str, port: int) -> Optional[Tuple[str, str, str]]:
-        return self.send_recv(port, MsgType.FindNode, target)
+    def find_value(self, target: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return Transport.bound(port).call(self.find_value_async(target, port))
 
-    def store(self, file: File, port: int) -> Optional[Tuple[str, str, str]]:
-        return self.send_recv(port, MsgType.Store, json.dumps(file.as_tuple()))
+    def get_value(self, file_id: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return Transport.bound(port).call(self.get_value_async(file_id, port))
 
-    def find_value(self, target: str, port: int) -> Optional[Tuple[str, str, str]]:
-        return self.send_recv(port, MsgType.FindValue, target)
+    def get_chunk(self, file_id: int, index: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return Transport.bound(port).call(self.get_chunk_async(file_id, index, port))
 
-    def get_value(self, filename: str, port: int) -> Optional[Tuple[str, str, str]]:
-        return self.send_recv(port, MsgType.GetValue, filename)
+    def get_range(self, file_id: int, offset: int, length: int, port: int) -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        return Transport.bound(port).call(self.get_range_async(file_id, offset, length, port))
 
     def is_older_than(self, n_seconds: int):
         return time.time() - self.last_seen > n_seconds and self.last_seen > 0
@@ -0,0 +1,35 @@
+from utils import get_target_range, Config
+from functools import lru_cache
+from typing import Tuple
+import hashlib
+import struct
+
+NONCE = struct.Struct(">Q")
+ID_BYTES = Config.IdBits.value // 8
+
+
+@lru_cache(maxsize=64)
+def target_range(difficulty: int) -> Tuple[int, int]:
+    return get_target_range(difficulty, Config.IdBits.value // 4)
+
+
+def pow_hash(node_id: int, nonce: int) -> int:
+    return int.from_bytes(hashlib.sha1(node_id.to_bytes(ID_BYTES, byteorder='big') + NONCE.pack(nonce)).digest(), byteorder='big')
+
+
+def verify(node_id: int, difficulty: int, nonce: int) -> bool:
+    min_target, max_target = target_range(difficulty)
+    return min_target < pow_hash(node_id, nonce) < max_target
+
+
+@lru_cache(maxsize=Config.PowCache.value)
+def solve(node_id: int, difficulty: int) -> int:
+    min_target, max_target = target_range(difficulty)
+    h = hashlib.sha1(node_id.to_bytes(ID_BYTES, byteorder='big'))
+    nonce = 0
+    while True:
+        attempt = h.copy()
+        attempt.update(NONCE.pack(nonce))
+        if min_target < int.from_bytes(attempt.digest(), byteorder='big') < max_target:
+            return nonce
+        nonce += 1
@@ -0,0 +1,199 @@
+from typing import Optional, List, Tuple, Iterator, Set
+from utils import Config, is_nth_bit_set, set_nth_bit
+from kbucket import KBucket
+from node import Node
+import threading
+import queue
+
+
+class TrieNode:
+    def __init__(self, depth: int = 0, prefix: int = 0):
+        self.depth:     int = depth
+        self.prefix:    int = prefix
+        self.bucket:    Optional[KBucket] = KBucket()
+        self.left:      Optional[TrieNode] = None
+        self.right:     Optional[TrieNode] = None
+
+    def is_leaf(self) -> bool:
+        return self.bucket is not None
+
+
+class RoutingTable:
+    def __init__(self, node_id: Optional[int] = None, split_bits: int = Config.SplitBits.value):
+        self.node_id:       Optional[int] = node_id
+        self.split_bits:    int = split_bits
+        self.root:          TrieNode = TrieNode()
+        self.k_nodes:       int = Config.KNodes.value
+        self.id_bits:       int = Config.IdBits.value
+        self.stale_after:   int = Config.StaleAfter.value
+        self.n_buckets:     int = 1
+        self.lock:          threading.RLock = threading.RLock()
+        self.stale:         queue.Queue = queue.Queue()
+        self.probing:       Set[int] = set()
+
+    def __len__(self) -> int:
+        return self.n_buckets
+
+    def bit(self, depth: int) -> int:
+        return self.id_bits - 1 - depth
+
+    def find_leaf(self, key: int) -> TrieNode:
+        current = self.root
+        while not current.is_leaf():
+            if is_nth_bit_set(key, self.bit(current.depth)):
+                current = current.right
+            else:
+                current = current.left
+        return current
+
+    def covers(self, leaf: TrieNode, key: int) -> bool:
+        shift = self.id_bits - leaf.depth
+        return key >> shift == leaf.prefix >> shift
+
+    # Kademlia section 4.2: only the bucket holding our own id splits, plus
+    # buckets whose depth is not a multiple of split_bits. That caps the
+    # table at max_buckets() buckets of k contacts no matter how many ids
+    # we hear about.
+    def can_split(self, leaf: TrieNode) -> bool:
+        if leaf.depth >= self.id_bits:
+            return False
+        if self.node_id is None or self.covers(leaf, self.node_id):
+            return True
+        return leaf.depth % self.split_bits != 0
+
+    def max_buckets(self) -> int:
+        return self.id_bits * 2 ** (self.split_bits - 1) + 1
+
+    def split(self, leaf: TrieNode) -> None:
+        bit = self.bit(leaf.depth)
+        k1, k2 = leaf.bucket.split_at(bit)
+        leaf.left = TrieNode(leaf.depth + 1, leaf.prefix)
+        leaf.right = TrieNode(leaf.depth + 1, set_nth_bit(leaf.prefix, bit))
+        leaf.left.bucket = k1
+        leaf.right.bucket = k2
+        leaf.bucket = None
+        self.n_buckets += 1
+
+    def add_node(self, port: int, new_node: Node) -> None:
+        with self.lock:
+            key = new_node.id
+            if key == self.node_id:
+                return
+            leaf = self.find_leaf(key)
+            bucket = leaf.bucket
+            if bucket.touch(key):
+                return
+
+            while bucket.size() >= self.k_nodes:
+                if not self.can_split(leaf):
+                    bucket.add_replacement(new_node)
+                    oldest_peer = bucket.oldest()
+                    if oldest_peer.is_older_than(self.stale_after):
+                        self.schedule_probe(oldest_peer)
+                    return
+                self.split(leaf)
+                leaf = self.find_leaf(key)
+                bucket = leaf.bucket
+
+            bucket.add(new_node)
+
+    def schedule_probe(self, node: Node) -> None:
+        if node.id not in self.probing:
+            self.probing.add(node.id)
+            self.stale.put(node)
+
+    def probed(self, node: Node, alive: bool) -> None:
+        with self.lock:
+            self.probing.discard(node.id)
+            if alive:
+                self.touch(node.id)
+            else:
+                self.remove_node(node)
+
+    def remove_node(self, node: Node) -> None:
+        with self.lock:
+            bucket = self.find_leaf(node.id).bucket
+            if bucket.find_node(node.id) is node:
+                bucket.delete(node)
+                bucket.promote()
+
+    def find_node(self, key: int) -> Optional[Node]:
+        with self.lock:
+            return self.find_leaf(key).bucket.find_node(key)
+
+    def touch(self, key: int) -> Optional[Node]:
+        with self.lock:
+            return self.find_leaf(key).bucket.touch(key)
+
+    def find_closest(self, key: int) -> Optional[KBucket]:
+        with self.lock:
+            stack = [self.root]
+            while stack:
+                current = stack.pop()
+                if current.is_leaf():
+                    if current.bucket.ids:
+                        return current.bucket
+                    continue
+
+                if is_nth_bit_set(key, self.bit(current.depth)):
+                    stack.append(current.left)
+                    stack.append(current.right)
+                else:
+                    stack.append(current.right)
+                    stack.append(current.left)
+            return None
+
+    def k_closest(self, key: int, k: Optional[int] = None) -> List[Node]:
+        with self.lock:
+            if k is None:
+                k = self.k_nodes
+            closest = []
+            stack = [self.root]
+            while stack and len(closest) < k:
+                current = stack.pop()
+                if current.is_leaf():
+                    if current.bucket.ids:
+                        closest += current.bucket.k_closest(key, k - len(closest))
+                    continue
+
+                if is_nth_bit_set(key, self.bit(current.depth)):
+                    stack.append(current.left)
+                    stack.append(current.right)
+                else:
+                    stack.append(current.right)
+                    stack.append(current.left)
+            return closest
+
+    def leaves(self) -> Iterator[TrieNode]:
+        stack = [self.root]
+        while stack:
+            current = stack.pop()
+            if current.is_leaf():
+                yield current
+            else:
+                stack.append(current.right)
+                stack.append(current.left)
+
+    def list(self) -> List[KBucket]:
+        with self.lock:
+            return [leaf.bucket for leaf in self.leaves()]
+
+    def list_nodes(self) -> List[Node]:
+        with self.lock:
+            nodes = []
+            for leaf in self.leaves():
+                if leaf.bucket.ids:
+                    nodes += leaf.bucket.inorder()
+            return nodes
+
+    def as_tuples(self) -> List[Tuple[str, int]]:
+        with self.lock:
+            tuples = []
+            for leaf in self.leaves():
+                if leaf.bucket.ids:
+                    tuples += leaf.bucket.as_tuples()
+            return tuples
+
+    def print_list(self) -> None:
+        for leaf in self.leaves():
+            print(format(leaf.prefix, '0{}b'.format(self.id_bits))[:leaf.depth] or '*', leaf.bucket.size())
@@ -0,0 +1,113 @@
+from typing import Optional, Hashable, Iterator, Tuple, Dict
+from collections import OrderedDict
+from utils import Config
+import itertools
+import threading
+import hashlib
+import struct
+import hmac
+import time
+import ssl
+
+# direction, send counter; both ends seal with the same key, so each direction gets its own nonce space
+NONCE = struct.Struct(">IQ")
+INITIATOR = 0
+RESPONDER = 1
+REPLAY_WINDOW = 1024
+COOKIE = 16
+
+
+class Session:
+    __slots__ = ('id', 'key', 'expires', 'sent', 'highest', 'window')
+
+    def __init__(self, key: bytes, ttl: float, session_id: Optional[bytes] = None):
+        self.id:        bytes = session_id or ssl.RAND_bytes(8)
+        self.key:       bytes = key
+        self.expires:   float = time.time() + ttl
+        self.sent:      Iterator[int] = itertools.count(1)
+        self.highest:   int = 0
+        self.window:    int = 0
+
+    def is_expired(self) -> bool:
+        return time.time() >= self.expires
+
+    def nonce(self, direction: int) -> bytes:
+        return NONCE.pack(direction, next(self.sent))
+
+    def accept(self, nonce: bytes, direction: int) -> bool:
+        # sliding replay window as in RFC 4303 3.4.3; only call this once the frame has authenticated
+        prefix, counter = NONCE.unpack(nonce)
+        if prefix != direction or not counter:
+            return False
+        if counter > self.highest:
+            self.window = (self.window << counter - self.highest | 1) & (1 << REPLAY_WINDOW) - 1
+            self.highest = counter
+            return True
+        offset = self.highest - counter
+        if offset >= REPLAY_WINDOW or self.window >> offset & 1:
+            return False
+        self.window |= 1 << offset
+        return True
+
+
+class SessionCache:
+    def __init__(self, ttl: float = Config.SessionTTL.value, size: int = Config.SessionCache.value):
+        self.ttl:       float = ttl
+        self.size:      int = size
+        self.sessions:  OrderedDict[Hashable, Session] = OrderedDict()
+        self.lock:      threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, key: Hashable) -> Optional[Session]:
+        with self.lock:
+            session = self.sessions.get(key)
+            if not session:
+                return None
+            if session.is_expired():
+                del self.sessions[key]
+                return None
+            self.sessions.move_to_end(key)
+            return session
+
+    def put(self, key: Hashable, session: Session) -> None:
+        with self.lock:
+            self.sessions[key] = session
+            self.sessions.move_to_end(key)
+            while len(self.sessions) > self.size:
+                self.sessions.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Session]:
+        with self.lock:
+            return self.sessions.pop(key, None)
+
+
+class Cookies:
+    def __init__(self, rotation: float = Config.CookieRotation.value):
+        self.rotation:  float = rotation
+        self.secrets:   Dict[int, bytes] = {}
+        self.lock:      threading.Lock = threading.Lock()
+
+    def epoch(self) -> int:
+        return int(time.time() // self.rotation)
+
+    def secret(self, epoch: int) -> Optional[bytes]:
+        # only the current secret and the one before it are kept, so a cookie lives one to two rotations
+        current = self.epoch()
+        with self.lock:
+            for old in [old for old in self.secrets if old < current - 1]:
+                del self.secrets[old]
+            if epoch == current and epoch not in self.secrets:
+                self.secrets[epoch] = ssl.RAND_bytes(32)
+            return self.secrets.get(epoch)
+
+    def cookie(self, epoch: int, addr: Tuple[str, int]) -> Optional[bytes]:
+        secret = self.secret(epoch)
+        if not secret:
+            return None
+        return hmac.new(secret, f"{addr[0]}:{addr[1]}".encode(), hashlib.sha256).digest()[:COOKIE]
+
+    def issue(self, addr: Tuple[str, int]) -> Tuple[int, bytes]:
+        epoch = self.epoch()
+        return epoch, self.cookie(epoch, addr)
@@ -0,0 +1,31 @@
+from typing import Dict, Hashable, Deque
+from collections import deque
+import threading
+
+
+class LatencyStats:
+    def __init__(self, window: int = 4096):
+        self.window:    int = window
+        self.samples:   Dict[Hashable, Deque[float]] = {}
+        self.lock:      threading.Lock = threading.Lock()
+
+    def record(self, key: Hashable, seconds: float) -> None:
+        with self.lock:
+            samples = self.samples.get(key)
+            if samples is None:
+                samples = self.samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: Hashable, p: float) -> float:
+        with self.lock:
+            samples = sorted(self.samples.get(key, ()))
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def summary(self) -> Dict[Hashable, Dict[str, float]]:
+        return {key: {'count': len(self.samples[key]),
+                      'p50': self.percentile(key, 50),
+                      'p95': self.percentile(key, 95),
+                      'p99': self.percentile(key, 99)}
+                for key in list(self.samples)}
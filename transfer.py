@@ -0,0 +1,305 @@
+from typing import Optional, Dict, List, Tuple, Iterable, Callable, Awaitable, Hashable
+from collections import OrderedDict, deque
+from utils import Config
+import threading
+import hashlib
+import asyncio
+import mmap
+import zlib
+import os
+
+CHUNK_HASH = 20
+# chunk encodings, sent as the first byte of a GetChunk answer
+RAW = 0
+DEFLATE = 1
+
+
+def digest(path: str, block_size: int = 1 << 20) -> int:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return int.from_bytes(h.digest(), byteorder='big')
+
+
+def decode_chunk(data: bytes, chunk_size: int) -> Optional[bytes]:
+    if not data:
+        return None
+    if data[0] == RAW:
+        return bytes(data[1:])
+    if data[0] == DEFLATE:
+        inflater = zlib.decompressobj()
+        try:
+            # a chunk never inflates past chunk_size, whatever the sender claims
+            return inflater.decompress(data[1:], chunk_size)
+        except zlib.error:
+            return None
+    return None
+
+
+class ChunkCache:
+    def __init__(self, capacity: int = Config.ChunkCache.value, overhead: int = 128):
+        self.capacity:  int = capacity
+        self.overhead:  int = overhead
+        self.size:      int = 0
+        self.entries:   OrderedDict[Hashable, bytes] = OrderedDict()
+        self.lock:      threading.Lock = threading.Lock()
+        self.hits:      int = 0
+        self.misses:    int = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old) + self.overhead
+            if len(value) + self.overhead > self.capacity:
+                return
+            self.entries[key] = value
+            self.size += len(value) + self.overhead
+            while self.size > self.capacity:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted) + self.overhead
+
+
+class Manifest:
+    def __init__(self, size: int, chunk_size: int, hashes: bytes, file_id: Optional[int] = None):
+        self.size:          int = size
+        self.chunk_size:    int = chunk_size
+        self.hashes:        bytes = hashes
+        self.file_id:       Optional[int] = file_id
+
+    def __len__(self) -> int:
+        return len(self.hashes) // CHUNK_HASH
+
+    @classmethod
+    def build(cls, path: str, chunk_size: int = Config.ChunkSize.value) -> "Manifest":
+        # the whole-file hash is the file id, so it is taken in the same pass as the chunk hashes
+        whole = hashlib.sha1()
+        hashes = []
+        size = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                whole.update(chunk)
+                hashes.append(hashlib.sha1(chunk).digest())
+                size += len(chunk)
+        return cls(size, chunk_size, b"".join(hashes), int.from_bytes(whole.digest(), byteorder='big'))
+
+    def span(self, index: int) -> range:
+        start = index * self.chunk_size
+        return range(start, min(start + self.chunk_size, self.size))
+
+    def verify(self, index: int, data: bytes) -> bool:
+        return (len(data) == len(self.span(index))
+                and hashlib.sha1(data).digest() == self.hashes[index * CHUNK_HASH:(index + 1) * CHUNK_HASH])
+
+
+class SharedFile:
+    def __init__(self, path: str, chunk_size: int = Config.ChunkSize.value):
+        self.path:          str = path
+        self.chunk_size:    int = chunk_size
+        self.manifest:      Optional[Manifest] = None
+        self.map:           Optional[mmap.mmap] = None
+        self.lock:          threading.Lock = threading.Lock()
+
+    def describe(self) -> Manifest:
+        with self.lock:
+            if not self.manifest:
+                self.manifest = Manifest.build(self.path, self.chunk_size)
+            return self.manifest
+
+    def range(self, offset: int, length: int) -> memoryview:
+        size = self.describe().size
+        if not size:
+            return memoryview(b"")
+        with self.lock:
+            if not self.map:
+                with open(self.path, 'rb') as f:
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self.map)[min(offset, size):min(offset + length, size)]
+
+    def read(self, index: int) -> Optional[memoryview]:
+        manifest = self.describe()
+        if not 0 <= index < len(manifest):
+            return None
+        span = manifest.span(index)
+        return self.range(span.start, len(span))
+
+    def chunk(self, index: int, cache: Optional[ChunkCache] = None) -> Optional[bytes]:
+        data = self.read(index)
+        if data is None:
+            return None
+        key = (self.path, index)
+        encoded = cache.get(key) if cache else None
+        if encoded is None:
+            # chunks that barely shrink are remembered as raw, so nobody compresses them again;
+            # a small sample rules out already compressed media before paying for the whole chunk
+            encoded = b""
+            if len(zlib.compress(data[:4096], 1)) < min(len(data), 4096) * 0.9:
+                compressed = zlib.compress(data, 1)
+                if len(compressed) < len(data) * 0.9:
+                    encoded = bytes((DEFLATE,)) + compressed
+            if cache:
+                cache.put(key, encoded)
+        return encoded or bytes((RAW,)) + data
+
+    def close(self) -> None:
+        with self.lock:
+            if self.map:
+                try:
+                    self.map.close()
+                except BufferError:
+                    # a range handed out earlier is still referenced, the map goes with it
+                    pass
+                self.map = None
+
+
+class Source:
+    def __init__(self, fetch: Callable[[int], Awaitable[Optional[bytes]]], window: int = Config.TransferWindow.value):
+        self.fetch:         Callable[[int], Awaitable[Optional[bytes]]] = fetch
+        self.max_window:    int = window
+        self.window:        float = min(2, window)
+        self.in_flight:     int = 0
+        self.latency:       Optional[float] = None
+        self.base:          Optional[float] = None
+        self.rate:          Optional[float] = None
+        self.received:      int = 0
+        self.failures:      int = 0
+
+    def ready(self) -> bool:
+        return self.in_flight < int(self.window)
+
+    def succeeded(self, size: int, elapsed: float) -> None:
+        # additive increase, one extra chunk in flight per window of successes, but only while the
+        # source keeps up; once responses queue behind each other a bigger window only adds latency
+        self.base = elapsed if self.base is None else min(self.base, elapsed)
+        if elapsed < 2 * self.base + 0.005:
+            self.window = min(self.max_window, self.window + 1 / self.window)
+        self.latency = elapsed if self.latency is None else 0.875 * self.latency + 0.125 * elapsed
+        rate = size * (self.in_flight + 1) / max(elapsed, 1e-6)
+        self.rate = rate if self.rate is None else 0.875 * self.rate + 0.125 * rate
+        self.received += size
+        self.failures = 0
+
+    def failed(self) -> None:
+        self.window = max(1.0, self.window / 2)
+        self.failures += 1
+
+    def priority(self) -> float:
+        # untried sources go first so every holder gets measured
+        return -self.rate if self.rate is not None else float('-inf')
+
+
+class Download:
+    def __init__(self, manifest: Manifest, path: str, file_id: Optional[int] = None,
+                 window: int = Config.TransferWindow.value, attempts: int = Config.ChunkAttempts.value,
+                 straggler: float = 3.0):
+        self.manifest:      Manifest = manifest
+        self.path:          str = path
+        self.file_id:       Optional[int] = file_id
+        self.window:        int = window
+        self.attempts:      int = attempts
+        self.straggler:     float = straggler
+        self.sources:       List[Source] = []
+        self.failures:      bytearray = bytearray(len(manifest))
+        self.done:          bytearray = bytearray(len(manifest))
+        self.received:      int = 0
+        self.retransmits:   int = 0
+        self.hedged:        int = 0
+
+    def lost(self, index: int) -> bool:
+        self.retransmits += 1
+        self.failures[index] = min(255, self.failures[index] + 1)
+        return self.failures[index] < self.attempts * max(1, len(self.sources))
+
+    def slow(self, source: Source, started: float, now: float) -> bool:
+        fastest = min((other.latency for other in self.sources if other.latency is not None), default=None)
+        return fastest is not None and source.latency != fastest and now - started > self.straggler * max(fastest, 0.01)
+
+    async def run(self, fetches: Iterable[Callable[[int], Awaitable[Optional[bytes]]]]) -> bool:
+        self.sources = [Source(fetch, self.window) for fetch in fetches]
+        part = self.path + ".part"
+        os.makedirs(os.path.dirname(part) or ".", exist_ok=True)
+        fd = os.open(part, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        missing = deque(range(len(self.manifest)))
+        in_flight: Dict[asyncio.Future, Tuple[Source, int, float]] = {}
+        requested: Dict[int, int] = {}
+        loop = asyncio.get_running_loop()
+
+        def request(source: Source, index: int) -> None:
+            source.in_flight += 1
+            requested[index] = requested.get(index, 0) + 1
+            in_flight[asyncio.ensure_future(source.fetch(index))] = (source, index, loop.time())
+
+        try:
+            os.ftruncate(fd, self.manifest.size)
+            while missing or in_flight:
+                active = sorted((source for source in self.sources if source.failures < self.attempts),
+                                key=Source.priority)
+                if not active:
+                    return False
+                for source in active:
+                    while missing and source.ready():
+                        index = missing.popleft()
+                        if not self.done[index]:
+                            request(source, index)
+
+                if not missing:
+                    # nothing left to hand out, so idle sources race the stragglers of slow ones
+                    now = loop.time()
+                    for source, index, started in list(in_flight.values()):
+                        if requested.get(index) != 1 or not self.slow(source, started, now):
+                            continue
+                        spare = next((other for other in active if other is not source and other.ready()), None)
+                        if spare:
+                            self.hedged += 1
+                            request(spare, index)
+
+                timeout = None
+                if not missing and len(active) > 1:
+                    timeout = max(0.01, min((source.latency for source in active if source.latency), default=0.1))
+                done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    source, index, started = in_flight.pop(task)
+                    source.in_flight -= 1
+                    requested[index] -= 1
+                    if self.done[index]:
+                        continue
+                    data = None if task.cancelled() or task.exception() else task.result()
+                    if data is not None and self.manifest.verify(index, data):
+                        os.pwrite(fd, data, self.manifest.span(index).start)
+                        self.done[index] = 1
+                        self.received += len(data)
+                        source.succeeded(len(data), loop.time() - started)
+                        for other, (_, duplicate, _) in list(in_flight.items()):
+                            if duplicate == index:
+                                other.cancel()
+                        continue
+                    source.failed()
+                    if requested[index]:
+                        continue
+                    if not self.lost(index):
+                        return False
+                    missing.append(index)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            os.close(fd)
+            if self.received < self.manifest.size:
+                os.remove(part)
+
+        if self.file_id is not None:
+            if await loop.run_in_executor(None, digest, part) != self.file_id:
+                os.remove(part)
+                return False
+        os.replace(part, self.path)
+        return True
@@ -0,0 +1,355 @@
+from typing import Optional, Tuple, Any, Dict, Deque, Callable, Iterator, Coroutine
+from collections import OrderedDict, deque
+from utils import MsgType, Config
+from key_exchange import generate_key_pair, derive_key
+from session import Session, SessionCache, INITIATOR, RESPONDER
+from stats import LatencyStats
+from wire import Frame
+import concurrent.futures
+import proof_of_work
+import threading
+import asyncio
+import socket
+import struct
+import wire
+import hmac
+import time
+import ssl
+
+# message id, fragment sequence, fragment count
+FRAGMENT = struct.Struct(">IHH")
+# datagrams drained per readiness callback before yielding to other callbacks
+READ_BATCH = 64
+
+
+def fragments(data: bytes, chunk_size: int) -> Iterator[Tuple[bytes, memoryview]]:
+    total = max(1, -(-len(data) // chunk_size))
+    if total > 0xffff:
+        raise ValueError("Message too large")
+    msg_id = wire.new_msg_id()
+    view = memoryview(data)
+    for seq in range(total):
+        offset = seq * chunk_size
+        yield FRAGMENT.pack(msg_id, seq, total), view[offset:offset + chunk_size]
+
+
+class Reassembly:
+    __slots__ = ('buffer', 'received', 'remaining', 'expires')
+
+    def __init__(self, total: int, ttl: float):
+        # the header is unauthenticated, so the buffer only grows as fragments actually arrive
+        self.buffer:    bytearray = bytearray()
+        self.received:  bytearray = bytearray(total)
+        self.remaining: int = total
+        self.expires:   float = time.monotonic() + ttl
+
+    def cost(self) -> int:
+        return len(self.buffer) + len(self.received)
+
+
+class Reassembler:
+    def __init__(self, chunk_size: int, ttl: float = Config.ReassemblyTimeout.value,
+                 slots: int = Config.ReassemblySlots.value, max_message: int = Config.MaxMessage.value,
+                 budget: int = Config.ReassemblyBudget.value):
+        self.chunk_size:    int = chunk_size
+        self.ttl:           float = ttl
+        self.slots:         int = slots
+        self.max_fragments: int = -(-max_message // chunk_size)
+        self.budget:        int = budget
+        self.used:          int = 0
+        self.pending:       OrderedDict[Tuple[Any, int], Reassembly] = OrderedDict()
+
+    def evict(self, key: Tuple[Any, int]) -> None:
+        self.used -= self.pending.pop(key).cost()
+
+    def expire(self) -> None:
+        now = time.monotonic()
+        while self.pending:
+            key, entry = next(iter(self.pending.items()))
+            if entry.expires > now and len(self.pending) < self.slots and self.used <= self.budget:
+                break
+            self.evict(key)
+
+    def feed(self, datagram: memoryview, addr: Tuple[str, int]) -> Optional[memoryview]:
+        if len(datagram) < FRAGMENT.size:
+            return None
+        msg_id, seq, total = FRAGMENT.unpack_from(datagram)
+        length = len(datagram) - FRAGMENT.size
+        if seq >= total or total > self.max_fragments or length > self.chunk_size:
+            return None
+        if seq < total - 1 and length != self.chunk_size:
+            return None
+        if total == 1:
+            return datagram[FRAGMENT.size:]
+
+        key = (addr, msg_id)
+        entry = self.pending.get(key)
+        if not entry:
+            self.expire()
+            entry = Reassembly(total, self.ttl)
+            self.pending[key] = entry
+            self.used += total
+        if len(entry.received) != total or entry.received[seq]:
+            return None
+
+        offset = seq * self.chunk_size
+        grow = offset + length - len(entry.buffer)
+        if grow > 0:
+            self.used += grow
+            if self.used > self.budget:
+                # oldest partial messages go first, possibly this one
+                self.expire()
+                if key not in self.pending:
+                    self.used -= grow
+                    return None
+            entry.buffer.extend(bytes(grow))
+        entry.buffer[offset:offset + length] = datagram[FRAGMENT.size:]
+        entry.received[seq] = 1
+        entry.remaining -= 1
+        if entry.remaining:
+            return None
+        self.evict(key)
+        return memoryview(entry.buffer)
+
+
+class Transport:
+    _bound: Dict[int, "Transport"] = {}
+
+    def __init__(self, port: int, handler: Optional[Callable[[Frame, Tuple[str, int]], None]] = None,
+                 seen: Optional[Callable[[int], Any]] = None):
+        self.port:          int = port
+        self.handler:       Optional[Callable[[Frame, Tuple[str, int]], None]] = handler
+        self.seen:          Optional[Callable[[int], Any]] = seen
+        self.buffer:        bytearray = bytearray(Config.BufferSize.value)
+        self.retries:       int = Config.Retries.value
+        self.stats:         LatencyStats = LatencyStats()
+        self.bytes_sent:    int = 0
+        self.sessions:      SessionCache = SessionCache()
+        self.pending:       Dict[int, asyncio.Future] = {}
+        self.handshakes:    Dict[Tuple[str, int], asyncio.Task] = {}
+        self.cookies:       OrderedDict[Tuple[str, int], Tuple[int, bytes]] = OrderedDict()
+        self.reassembler:   Reassembler = Reassembler(len(self.buffer) - FRAGMENT.size)
+        self.backlog:       Deque[Tuple[bytes, Tuple[str, int]]] = deque()
+        self.loop:          Optional[asyncio.AbstractEventLoop] = None
+        self.sock:          Optional[socket.socket] = None
+        self.opened:        threading.Event = threading.Event()
+
+    @classmethod
+    def bound(cls, port: int) -> "Transport":
+        return cls._bound[port]
+
+    async def open(self, addr: str) -> None:
+        self.loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, Config.RecvBuffer.value)
+        sock.bind((addr, self.port))
+        sock.setblocking(False)
+        self.sock = sock
+        # a plain reader instead of a datagram endpoint, so every datagram lands in the same
+        # preallocated buffer rather than in a fresh bytes object
+        self.loop.add_reader(sock.fileno(), self.read_ready)
+        Transport._bound[self.port] = self
+        self.opened.set()
+
+    def call(self, coro: Coroutine) -> Any:
+        return self.spawn(coro).result()
+
+    def spawn(self, coro: Coroutine) -> concurrent.futures.Future:
+        self.opened.wait()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def read_ready(self) -> None:
+        view = memoryview(self.buffer)
+        for _ in range(READ_BATCH):
+            try:
+                n_bytes, addr = self.sock.recvfrom_into(self.buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # ICMP errors for earlier sends surface here, the socket itself is fine
+                continue
+            self.datagram_received(view[:n_bytes], addr)
+
+    def datagram_received(self, datagram: memoryview, addr: Tuple[str, int]) -> None:
+        message = self.reassembler.feed(datagram, addr)
+        if message is None:
+            return
+        try:
+            frame = wire.decode(message)
+        except ValueError:
+            return
+
+        if frame.type in wire.RESPONSES:
+            future = self.pending.get(frame.msg_id)
+            if future and not future.done():
+                if message.obj is self.buffer:
+                    # the waiter runs after the next recvfrom_into has overwritten the buffer
+                    frame.body = bytearray(frame.body)
+                future.set_result((frame, addr))
+        elif self.handler:
+            try:
+                self.handler(frame, addr)
+            except Exception as e:
+                print(e)
+
+    def write(self, datagram: bytes, addr: Tuple[str, int]) -> None:
+        if not self.backlog:
+            try:
+                self.sock.sendto(datagram, addr)
+                return
+            except (BlockingIOError, InterruptedError):
+                self.loop.add_writer(self.sock.fileno(), self.write_ready)
+            except OSError:
+                return
+        self.backlog.append((datagram, addr))
+
+    def write_ready(self) -> None:
+        while self.backlog:
+            datagram, addr = self.backlog[0]
+            try:
+                self.sock.sendto(datagram, addr)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                pass
+            self.backlog.popleft()
+        self.loop.remove_writer(self.sock.fileno())
+
+    def sendto(self, data: bytes, addr: Tuple[str, int]) -> None:
+        for header, chunk in fragments(data, self.reassembler.chunk_size):
+            self.write(header + chunk, addr)
+            self.bytes_sent += len(header) + len(chunk)
+
+    async def request(self, msg_id: int, data: bytes, addr: Tuple[str, int], timeout: float) -> Optional[Tuple[Frame, Tuple[str, int]]]:
+        future = self.loop.create_future()
+        self.pending[msg_id] = future
+        try:
+            self.sendto(data, addr)
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, socket.error, ValueError):
+            return None
+        finally:
+            self.pending.pop(msg_id, None)
+
+    async def exchange(self, peer: Any, header: MsgType, seal: Callable[[Frame], bytes],
+                       session: bytes = wire.NO_SESSION) -> Optional[Tuple[Frame, Tuple[str, int]]]:
+        start = time.monotonic()
+        for _ in range(self.retries + 1):
+            frame = Frame(header, self.port, wire.new_msg_id(), session)
+            sent = time.monotonic()
+            response = await self.request(frame.msg_id, seal(frame), peer.address(), peer.timeout())
+            if response:
+                peer.observe_rtt(time.monotonic() - sent)
+                if self.seen:
+                    # any answer is proof of life, so the contact moves to the fresh end of its bucket
+                    self.seen(peer.id)
+                self.stats.record(header, time.monotonic() - start)
+                return response
+            peer.backoff()
+        return None
+
+    async def perform_key_exchange(self, peer: Any) -> Optional[Session]:
+        private_key, pub_key = generate_key_pair()
+        nonce = await self.loop.run_in_executor(None, proof_of_work.solve, peer.id, peer.difficulty)
+        body = wire.pack_handshake(nonce, pub_key)
+
+        def seal(frame: Frame) -> bytes:
+            frame.body = body
+            return wire.encode(frame)
+
+        response = await self.exchange(peer, MsgType.Handshake, seal)
+        if not response or response[0].type != MsgType.HandshakeAck:
+            return None
+        frame = response[0]
+        try:
+            epoch, cookie, remote_pub_key = wire.unpack_handshake_ack(frame.body)
+            session = Session(derive_key(private_key, remote_pub_key), self.sessions.ttl, frame.session)
+        except (struct.error, ValueError):
+            return None
+        self.sessions.put(peer.address(), session)
+        self.remember_cookie(peer.address(), epoch, wire.mask_cookie(session.key, cookie))
+        return session
+
+    def remember_cookie(self, addr: Tuple[str, int], epoch: int, cookie: bytes) -> None:
+        self.cookies[addr] = (epoch, cookie)
+        self.cookies.move_to_end(addr)
+        while len(self.cookies) > Config.CookieCache.value:
+            self.cookies.popitem(last=False)
+
+    async def session_for(self, peer: Any) -> Optional[Session]:
+        session = self.sessions.get(peer.address())
+        if session:
+            return session
+        addr = peer.address()
+        handshake = self.handshakes.get(addr)
+        if not handshake:
+            handshake = self.loop.create_task(self.perform_key_exchange(peer))
+            handshake.add_done_callback(lambda _: self.handshakes.pop(addr, None))
+            self.handshakes[addr] = handshake
+        return await handshake
+
+    async def probe(self, peer: Any) -> bool:
+        addr = peer.address()
+        session = self.sessions.get(addr)
+        epoch, cookie = self.cookies.get(addr, (0, None))
+        if not session and not cookie:
+            # nothing to key a tag with, so prove liveness with an authenticated ping instead
+            return await self.ping(peer)
+        challenge = ssl.RAND_bytes(wire.PROBE_CHALLENGE)
+        body = wire.pack_probe(challenge, epoch)
+
+        def seal(frame: Frame) -> bytes:
+            frame.body = body
+            return wire.encode(frame)
+
+        response = await self.exchange(peer, MsgType.Probe, seal, session.id if session else wire.NO_SESSION)
+        if not response or response[0].type != MsgType.ProbeAck:
+            return False
+        echoed, tag = wire.unpack_probe_ack(response[0].body)
+        if not hmac.compare_digest(echoed, challenge):
+            return False
+        if session and hmac.compare_digest(tag, wire.probe_tag(session.key, challenge)):
+            return True
+        if session:
+            # alive, but it no longer knows our session
+            self.sessions.pop(addr)
+        if cookie and hmac.compare_digest(tag, wire.probe_tag(cookie, challenge)):
+            return True
+        if tag:
+            return False
+        # the cookie rotated out, a fresh handshake hands out a new one
+        self.cookies.pop(addr, None)
+        return await self.ping(peer)
+
+    async def ping(self, peer: Any) -> bool:
+        response = await self.send_recv(peer, MsgType.Ping)
+        return bool(response) and response[0] == MsgType.Pong
+
+    async def send(self, peer: Any, header: MsgType, payload: bytes = b"") -> Optional[Session]:
+        session = await self.session_for(peer)
+        if session:
+            frame = Frame(header, self.port, wire.new_msg_id(), session.id)
+            self.sendto(wire.seal(frame, session.key, payload, session.nonce(INITIATOR)), peer.address())
+        return session
+
+    async def send_recv(self, peer: Any, header: MsgType, payload: bytes = b"") -> Optional[Tuple[MsgType, bytes, Tuple[str, int]]]:
+        for _ in range(2):
+            session = await self.session_for(peer)
+            if not session:
+                return None
+            response = await self.exchange(peer, header, lambda frame: wire.seal(frame, session.key, payload, session.nonce(INITIATOR)),
+                                           session.id)
+            if not response:
+                return None
+            frame, addr = response
+            if frame.type == MsgType.Rekey:
+                self.sessions.pop(peer.address())
+                continue
+            try:
+                data = wire.unseal(frame, session.key)
+            except ValueError:
+                return None
+            if not session.accept(frame.nonce, RESPONDER):
+                return None
+            return frame.type, data, addr
+        return None
@@ -1,7 +1,10 @@
 from typing import Optional, Any, List, Tuple, Union
 from dotenv import dotenv_values
+from functools import lru_cache
 from enum import Enum
+import hashlib
 import random
+import socket
 
 config = dotenv_values(".env")
 
@@ -16,14 +19,48 @@ class MsgType(str, Enum):
     Store = '7'
     Stored = '8'
     Event = '9'
+    Handshake = '10'
+    HandshakeAck = '11'
+    Rekey = '12'
+    Probe = '13'
+    ProbeAck = '14'
+    GetChunk = '15'
+    GetRange = '16'
 
 
 class Config(Enum):
     BufferSize = 4096
-    KeyLength = 540
-    Generator = 3
+    Curve = 'P-256'
     KNodes = 20
     Alpha = 3
+    IdBits = 160
+    ReplacementCache = 8
+    StaleAfter = 3600
+    SplitBits = 1
+    SessionTTL = 600
+    SessionCache = 1024
+    CookieRotation = 7200
+    CookieCache = 2048
+    RecvBuffer = 1 << 21
+    ReassemblyTimeout = 5
+    ReassemblySlots = 256
+    MaxMessage = 1 << 24
+    ReassemblyBudget = 1 << 25
+    Retries = 2
+    ProbeBatch = 32
+    PowCache = 8192
+    MineChunk = 1 << 14
+    SegmentSize = 1 << 26
+    CheckpointEvery = 10000
+    ValueTTL = 86400
+    StoreCapacity = 1 << 20
+    CompactAfter = 50000
+    IndexAfter = 20000
+    FlushInterval = 0.5
+    ChunkSize = 1 << 16
+    TransferWindow = 16
+    ChunkAttempts = 10
+    ChunkCache = 1 << 27
     PubKey = config['PUB_KEY']
     BackupHosts = [
             "www.host.com",
@@ -127,6 +164,23 @@ def get_target_range(difficulty: int, n_bytes: int) -> Tuple[int, int]:
     return min_target, max_target
 
 
+@lru_cache(maxsize=None)
+def local_address() -> str:
+    return socket.gethostbyname(socket.gethostname())
+
+
+def sha1_id(data: bytes) -> int:
+    return int.from_bytes(hashlib.sha1(data).digest(), byteorder='big')
+
+
+def id_to_hex(node_id: int) -> str:
+    return '{:040x}'.format(node_id)
+
+
+def hex_to_id(hex_id: str) -> int:
+    return int(hex_id, 16)
+
+
 def hexify_ip(addr: str) -> str:
     hexaddr = ""
     for octet in addr.split("."):
@@ -0,0 +1,212 @@
+from typing import Optional, Iterator, Iterable, Tuple
+from file import File
+import shutil
+import struct
+import mmap
+import wire
+import os
+
+PUT = 1
+DELETE = 2
+
+# op, expires, payload length | packed file or id
+ENTRY = struct.Struct(">BdI")
+# magic, record count, log position covered by the index
+INDEX_HEADER = struct.Struct(">4sQQ")
+# file id, expires, log offset
+INDEX_ENTRY = struct.Struct(">20sdQ")
+MAGIC = b"VIDX"
+
+
+class ValueLog:
+    def __init__(self, directory: str):
+        self.directory:     str = directory
+        os.makedirs(directory, exist_ok=True)
+        self.generation:    int = 0
+        try:
+            with open(os.path.join(directory, "CURRENT")) as f:
+                self.generation = int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            pass
+        self.data = open(self.path("dat"), 'ab+')
+        self.size:          int = self.data.seek(0, os.SEEK_END)
+        self.map:           Optional[mmap.mmap] = None
+        self.index:         Optional[mmap.mmap] = None
+        self.count:         int = 0
+        self.position:      int = 0
+        self.open_index()
+
+    def path(self, extension: str, generation: Optional[int] = None) -> str:
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.directory, f"values-{generation:08d}.{extension}")
+
+    def open_index(self) -> None:
+        try:
+            with open(self.path("idx"), 'rb') as f:
+                index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return
+        magic, count, position = INDEX_HEADER.unpack_from(index)
+        if magic != MAGIC or len(index) != INDEX_HEADER.size + count * INDEX_ENTRY.size:
+            index.close()
+            return
+        self.index, self.count, self.position = index, count, position
+
+    def entry(self, i: int) -> Tuple[int, float, int]:
+        file_id, expires, offset = INDEX_ENTRY.unpack_from(self.index, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+        return int.from_bytes(file_id, byteorder='big'), expires, offset
+
+    def lookup(self, file_id: int) -> Optional[Tuple[float, int]]:
+        if not self.index:
+            return None
+        key = wire.pack_id(file_id)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = INDEX_HEADER.size + mid * INDEX_ENTRY.size
+            if self.index[start:start + 20] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            entry_id, expires, offset = self.entry(lo)
+            if entry_id == file_id:
+                return expires, offset
+        return None
+
+    def view(self, end: int) -> mmap.mmap:
+        if not self.map or len(self.map) < end:
+            self.data.flush()
+            if self.map:
+                self.map.close()
+            self.map = mmap.mmap(self.data.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def append(self, op: int, expires: float, payload: bytes) -> int:
+        offset = self.size
+        self.data.write(ENTRY.pack(op, expires, len(payload)) + payload)
+        self.size += ENTRY.size + len(payload)
+        return offset
+
+    def put(self, file: File, expires: float) -> int:
+        return self.append(PUT, expires, wire.pack_file(file))
+
+    def delete(self, file_id: int) -> None:
+        self.append(DELETE, 0.0, wire.pack_id(file_id))
+
+    def record(self, offset: int) -> bytes:
+        view = self.view(offset + ENTRY.size)
+        length = ENTRY.unpack_from(view, offset)[2]
+        return self.view(offset + ENTRY.size + length)[offset:offset + ENTRY.size + length]
+
+    def read(self, offset: int) -> File:
+        return wire.unpack_file(memoryview(self.record(offset))[ENTRY.size:])
+
+    def replay(self) -> Iterator[Tuple[int, int, float, int]]:
+        offset = self.position
+        while offset + ENTRY.size <= self.size:
+            op, expires, length = ENTRY.unpack_from(self.view(offset + ENTRY.size), offset)
+            if op not in (PUT, DELETE) or offset + ENTRY.size + length > self.size:
+                break
+            payload = self.view(offset + ENTRY.size + length)[offset + ENTRY.size:offset + ENTRY.size + length]
+            yield op, wire.unpack_id(payload), expires, offset
+            offset += ENTRY.size + length
+        if offset < self.size:
+            # torn write at the end of the log
+            self.data.truncate(offset)
+            self.size = offset
+            if self.map:
+                self.map.close()
+                self.map = None
+
+    def flush(self, sync: bool = True) -> None:
+        self.data.flush()
+        if sync:
+            os.fsync(self.data.fileno())
+
+    def detach(self) -> int:
+        # a descriptor of its own, so the caller can fsync without holding up writers or racing a switch
+        self.data.flush()
+        return os.dup(self.data.fileno())
+
+    def rewrite(self, live: Iterable[Tuple[int, float, int]], end: int) -> dict:
+        # runs beside appends, so it reads through a map of its own and never past end
+        generation = self.generation + 1
+        moved = {}
+        entries = []
+        with open(self.path("dat"), 'rb') as f, open(self.path("dat", generation), 'wb') as data:
+            view = mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ) if end else b""
+            try:
+                for file_id, expires, offset in live:
+                    length = ENTRY.unpack_from(view, offset)[2]
+                    moved[offset] = data.tell()
+                    entries.append((wire.pack_id(file_id), expires, data.tell()))
+                    data.write(view[offset:offset + ENTRY.size + length])
+            finally:
+                if end:
+                    view.close()
+            position = data.tell()
+            data.flush()
+            os.fsync(data.fileno())
+
+        self.write_index(entries, position, generation)
+        return moved
+
+    def write_index(self, entries: list, position: int, generation: Optional[int] = None) -> None:
+        entries.sort()
+        path = self.path("idx", generation)
+        with open(path + ".tmp", 'wb') as index:
+            index.write(INDEX_HEADER.pack(MAGIC, len(entries), position))
+            index.write(b"".join(INDEX_ENTRY.pack(*entry) for entry in entries))
+            index.flush()
+            os.fsync(index.fileno())
+        os.replace(path + ".tmp", path)
+
+    def checkpoint(self, live: Iterable[Tuple[int, float, int]], end: int) -> None:
+        # indexes the current generation in place; offsets stay valid, so nothing is copied
+        self.write_index([(wire.pack_id(file_id), expires, offset) for file_id, expires, offset in live], end)
+
+    def reload_index(self) -> None:
+        if self.index:
+            self.index.close()
+        self.index, self.count, self.position = None, 0, 0
+        self.open_index()
+
+    def switch(self, end: int) -> int:
+        # whatever was appended while rewrite ran is carried over behind the copy and replayed from the index position
+        generation = self.generation + 1
+        self.data.flush()
+        with open(self.path("dat", generation), 'ab') as data, open(self.path("dat"), 'rb') as f:
+            base = data.tell()
+            f.seek(end)
+            shutil.copyfileobj(f, data)
+            data.flush()
+            os.fsync(data.fileno())
+
+        current = os.path.join(self.directory, "CURRENT")
+        with open(current + ".tmp", 'w') as f:
+            f.write(str(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current + ".tmp", current)
+
+        old = self.generation
+        self.close()
+        self.generation = generation
+        self.data = open(self.path("dat"), 'ab+')
+        self.size = self.data.seek(0, os.SEEK_END)
+        self.open_index()
+        for extension in ("dat", "idx"):
+            try:
+                os.remove(self.path(extension, old))
+            except FileNotFoundError:
+                pass
+        return base
+
+    def close(self) -> None:
+        for resource in (self.map, self.index):
+            if resource:
+                resource.close()
+        self.map = self.index = None
+        self.count = 0
+        self.data.close()
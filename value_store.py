@@ -0,0 +1,288 @@
+from typing import Optional, List, Tuple, Iterator, Set
+from collections import OrderedDict
+from value_log import ValueLog, PUT
+from utils import Config
+from file import File
+import threading
+import heapq
+import time
+import os
+
+# index entries read per lock hold while compaction takes its snapshot
+SNAPSHOT_BATCH = 10000
+
+
+class Record:
+    __slots__ = ('file', 'expires', 'location')
+
+    def __init__(self, file: Optional[File], expires: float, location: Optional[int] = None):
+        self.file:      Optional[File] = file
+        self.expires:   float = expires
+        self.location:  Optional[int] = location
+
+
+class ValueStore:
+    def __init__(self, ttl: float = Config.ValueTTL.value, capacity: int = Config.StoreCapacity.value,
+                 log: Optional[ValueLog] = None):
+        self.ttl:       float = ttl
+        self.capacity:  int = capacity
+        self.records:   OrderedDict[int, Record] = OrderedDict()
+        self.expiry:    List[Tuple[float, int]] = []
+        self.lock:      threading.RLock = threading.RLock()
+        self.rewriting: threading.Lock = threading.Lock()
+        self.log:       Optional[ValueLog] = log
+        self.deleted:   Set[int] = set()
+        self.count:     int = 0
+        self.dead:      int = 0
+        self.unindexed: int = 0
+        self.cursor:    int = 0
+        if log:
+            self.restore()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, file_id: int) -> bool:
+        return self.get(file_id) is not None
+
+    def __iter__(self) -> Iterator[File]:
+        with self.lock:
+            return iter([file for file in (self.get(file_id) for file_id in list(self.ids())) if file])
+
+    def ids(self) -> Iterator[int]:
+        yield from self.records
+        if self.log:
+            for i in range(self.log.count):
+                file_id = self.log.entry(i)[0]
+                if file_id not in self.records and file_id not in self.deleted:
+                    yield file_id
+
+    def on_disk(self, file_id: int) -> bool:
+        return bool(self.log) and file_id not in self.deleted and self.log.lookup(file_id) is not None
+
+    def add(self, file: File, ttl: Optional[float] = None) -> None:
+        expires = time.time() + (ttl if ttl is not None else self.ttl)
+        with self.lock:
+            self.expire()
+            location = self.log.put(file, expires) if self.log else None
+            self.unindexed += bool(self.log)
+            record = self.records.get(file.id)
+            if record or self.on_disk(file.id):
+                self.dead += 1
+                record = record or Record(file, expires)
+                record.file, record.expires, record.location = file, expires, location
+                self.records[file.id] = record
+                self.records.move_to_end(file.id)
+            else:
+                self.records[file.id] = Record(file, expires, location)
+                self.deleted.discard(file.id)
+                self.count += 1
+                while self.count > self.capacity:
+                    self.evict()
+            heapq.heappush(self.expiry, (expires, file.id))
+            if len(self.expiry) > 2 * len(self.records) + 64:
+                self.expiry = [(record.expires, file_id) for file_id, record in self.records.items()]
+                heapq.heapify(self.expiry)
+
+    def get(self, file_id: int) -> Optional[File]:
+        with self.lock:
+            record = self.records.get(file_id)
+            if not record and self.log and file_id not in self.deleted:
+                found = self.log.lookup(file_id)
+                if found:
+                    record = Record(None, found[0], found[1])
+                    self.records[file_id] = record
+            if not record:
+                return None
+            if record.expires <= time.time():
+                self.drop(file_id)
+                return None
+            if not record.file:
+                record.file = self.log.read(record.location)
+            self.records.move_to_end(file_id)
+            return record.file
+
+    def drop(self, file_id: int) -> Optional[Record]:
+        record = self.records.pop(file_id, None)
+        if not record and self.on_disk(file_id):
+            record = Record(None, 0.0)
+        if record:
+            self.count -= 1
+            if self.log:
+                self.log.delete(file_id)
+                self.deleted.add(file_id)
+                self.dead += 2
+                self.unindexed += 1
+        return record
+
+    def evict(self) -> None:
+        # entries still only on disk have not been touched since the last restart, so they go first
+        while self.log and self.cursor < self.log.count:
+            file_id = self.log.entry(self.cursor)[0]
+            self.cursor += 1
+            if file_id not in self.records and file_id not in self.deleted:
+                self.drop(file_id)
+                return
+        self.drop(next(iter(self.records)))
+
+    def remove(self, file_id: int) -> Optional[File]:
+        with self.lock:
+            file = self.get(file_id)
+            self.drop(file_id)
+            return file
+
+    def expire(self, now: Optional[float] = None) -> int:
+        now = now if now is not None else time.time()
+        expired = 0
+        while self.expiry and self.expiry[0][0] <= now:
+            expires, file_id = heapq.heappop(self.expiry)
+            record = self.records.get(file_id)
+            # stale heap entries belong to records that were refreshed or evicted since
+            if record and record.expires == expires:
+                self.drop(file_id)
+                expired += 1
+        return expired
+
+    def restore(self) -> None:
+        self.count = self.log.count
+        for op, file_id, expires, location in self.log.replay():
+            known = file_id in self.records or self.on_disk(file_id)
+            self.unindexed += 1
+            if op == PUT:
+                self.records[file_id] = Record(None, expires, location)
+                self.deleted.discard(file_id)
+                self.count += not known
+                self.dead += known
+                heapq.heappush(self.expiry, (expires, file_id))
+            elif known:
+                self.records.pop(file_id, None)
+                self.deleted.add(file_id)
+                self.count -= 1
+                self.dead += 2
+
+    def needs_compaction(self) -> bool:
+        return bool(self.log) and self.dead > max(self.count, Config.CompactAfter.value)
+
+    def needs_checkpoint(self) -> bool:
+        # a restart replays everything past the index, so the index has to keep up with fresh stores too
+        return bool(self.log) and self.unindexed > Config.IndexAfter.value
+
+    def snapshot(self) -> Tuple[list, list, int, int, int]:
+        with self.lock:
+            now = time.time()
+            live, gone = [], []
+            for file_id, record in self.records.items():
+                (live if record.expires > now else gone).append((file_id, record.expires, record.location))
+            cached = set(self.records)
+            self.log.flush(sync=False)
+            mark, dead, unindexed, count = self.log.size, self.dead, self.unindexed, self.log.count
+        # the index is fixed until the next switch, so it is walked a batch at a time; anything cached
+        # since the snapshot came from this index and is picked up with it
+        for start in range(0, count, SNAPSHOT_BATCH):
+            with self.lock:
+                for i in range(start, min(start + SNAPSHOT_BATCH, count)):
+                    file_id, expires, location = self.log.entry(i)
+                    if file_id not in cached and file_id not in self.deleted:
+                        (live if expires > now else gone).append((file_id, expires, location))
+        return live, gone, mark, dead, unindexed
+
+    def checkpoint(self) -> None:
+        with self.rewriting:
+            live, gone, mark, _, unindexed = self.snapshot()
+            # expired entries stay indexed until the next compaction, so the live count does not move
+            live += gone
+            self.log.checkpoint(live, mark)
+            kept = {file_id for file_id, _, _ in live}
+
+            with self.lock:
+                self.log.reload_index()
+                self.deleted &= kept
+                self.unindexed -= unindexed
+                self.cursor = 0
+
+    def compact(self) -> None:
+        # the lock is only held to take a snapshot and to switch over; the copy runs beside readers and writers
+        with self.rewriting:
+            live, gone, mark, dead, unindexed = self.snapshot()
+            moved = self.log.rewrite(live, mark)
+            kept = {file_id for file_id, _, _ in live}
+
+            with self.lock:
+                base = self.log.switch(mark)
+                for record in self.records.values():
+                    if record.location < mark:
+                        record.location = moved.get(record.location)
+                    else:
+                        record.location = base + record.location - mark
+                for file_id, _, _ in gone:
+                    # expired at the snapshot and neither dropped nor stored again since
+                    record = self.records.get(file_id)
+                    if file_id not in self.deleted and (not record or record.location is None):
+                        self.count -= 1
+                for file_id in [file_id for file_id, record in self.records.items() if record.location is None]:
+                    del self.records[file_id]
+                self.deleted &= kept
+                self.dead -= dead
+                self.unindexed -= unindexed
+                self.cursor = 0
+
+    def maintain(self) -> None:
+        self.sync()
+        if self.needs_compaction():
+            self.compact()
+        elif self.needs_checkpoint():
+            self.checkpoint()
+
+    def sync(self) -> None:
+        with self.lock:
+            if not self.log:
+                return
+            fd = self.log.detach()
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        if self.log:
+            self.compact()
+        with self.lock:
+            if self.log:
+                self.log.close()
+
+    def as_tuples(self) -> List[Tuple[str, str, str, int, float]]:
+        return [file.as_tuple() for file in self]
+
+
+class Providers:
+    def __init__(self, ttl: float = Config.ValueTTL.value, capacity: int = Config.StoreCapacity.value,
+                 per_value: int = Config.KNodes.value):
+        self.ttl:       float = ttl
+        self.capacity:  int = capacity
+        self.per_value: int = per_value
+        self.holders:   OrderedDict[int, OrderedDict[Tuple[str, int], float]] = OrderedDict()
+        self.lock:      threading.Lock = threading.Lock()
+
+    def add(self, file_id: int, addr: Tuple[str, int]) -> None:
+        with self.lock:
+            holders = self.holders.setdefault(file_id, OrderedDict())
+            self.holders.move_to_end(file_id)
+            holders[addr] = time.time() + self.ttl
+            holders.move_to_end(addr)
+            while len(holders) > self.per_value:
+                holders.popitem(last=False)
+            while len(self.holders) > self.capacity:
+                self.holders.popitem(last=False)
+
+    def get(self, file_id: int) -> List[Tuple[str, int]]:
+        now = time.time()
+        with self.lock:
+            holders = self.holders.get(file_id)
+            if not holders:
+                return []
+            for addr in [addr for addr, expires in holders.items() if expires <= now]:
+                del holders[addr]
+            if not holders:
+                del self.holders[file_id]
+            # most recent announcements first
+            return list(reversed(holders))
@@ -0,0 +1,211 @@
+from typing import Optional, List, Tuple, Iterable
+from Crypto.Cipher import AES
+from transfer import Manifest, CHUNK_HASH
+from utils import MsgType
+from file import File
+import hashlib
+import socket
+import struct
+import hmac
+import ssl
+
+VERSION = 1
+
+# version, type, sender port, message id, session id | gcm nonce, gcm tag
+AAD = struct.Struct(">BBHI8s")
+HEADER = struct.Struct(">BBHI8s12s16s")
+CONTACT = struct.Struct(">4sH")
+FILE = struct.Struct(">20s20sdQ")
+NODE_ID = struct.Struct(">20s")
+POW_NONCE = struct.Struct(">Q")
+SIGNATURE = struct.Struct(">H")
+# file size, chunk size | chunk hashes
+MANIFEST = struct.Struct(">QI")
+# file id, chunk index
+CHUNK_REQUEST = struct.Struct(">20sI")
+# file id, byte offset, length
+RANGE_REQUEST = struct.Struct(">20sQI")
+# holder count | holder contacts, file
+HOLDERS = struct.Struct(">H")
+# cookie epoch, masked cookie | public key
+HANDSHAKE_ACK = struct.Struct(">I16s")
+# probe challenge, cookie epoch
+PROBE = struct.Struct(">16sI")
+
+NO_SESSION = bytes(8)
+PROBE_CHALLENGE = 16
+PROBE_TAG = 16
+RESPONSES = frozenset((MsgType.Found, MsgType.NotFound, MsgType.Pong, MsgType.Stored,
+                       MsgType.HandshakeAck, MsgType.Rekey, MsgType.ProbeAck))
+
+
+class Frame:
+    __slots__ = ('type', 'port', 'msg_id', 'session', 'nonce', 'tag', 'body')
+
+    def __init__(self, msg_type: MsgType, port: int, msg_id: int, session: bytes = NO_SESSION,
+                 nonce: bytes = bytes(12), tag: bytes = bytes(16), body: bytes = b""):
+        self.type:      MsgType = msg_type
+        self.port:      int = port
+        self.msg_id:    int = msg_id
+        self.session:   bytes = session
+        self.nonce:     bytes = nonce
+        self.tag:       bytes = tag
+        self.body:      bytes = body
+
+    def aad(self) -> bytes:
+        return AAD.pack(VERSION, int(self.type.value), self.port, self.msg_id, self.session)
+
+
+def new_msg_id() -> int:
+    return int.from_bytes(ssl.RAND_bytes(4), byteorder='big')
+
+
+def encode(frame: Frame) -> bytes:
+    return HEADER.pack(VERSION, int(frame.type.value), frame.port, frame.msg_id, frame.session,
+                       frame.nonce, frame.tag) + frame.body
+
+
+def decode(data: bytes) -> Frame:
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated frame")
+    version, msg_type, port, msg_id, session, nonce, tag = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported wire version {version}")
+    return Frame(MsgType(str(msg_type)), port, msg_id, session, nonce, tag, memoryview(data)[HEADER.size:])
+
+
+def seal(frame: Frame, key: bytes, payload: bytes = b"", nonce: Optional[bytes] = None) -> bytes:
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce or ssl.RAND_bytes(12))
+    cipher.update(frame.aad())
+    frame.body, frame.tag = cipher.encrypt_and_digest(payload)
+    frame.nonce = cipher.nonce
+    return encode(frame)
+
+
+def unseal(frame: Frame, key: bytes, in_place: bool = False) -> bytes:
+    cipher = AES.new(key, AES.MODE_GCM, nonce=frame.nonce)
+    cipher.update(frame.aad())
+    if in_place:
+        cipher.decrypt_and_verify(frame.body, frame.tag, output=frame.body)
+        return frame.body
+    return cipher.decrypt_and_verify(frame.body, frame.tag)
+
+
+def probe_tag(key: bytes, challenge: bytes) -> bytes:
+    return hmac.new(key, b"probe" + challenge, hashlib.sha256).digest()[:PROBE_TAG]
+
+
+def pack_probe(challenge: bytes, epoch: int) -> bytes:
+    return PROBE.pack(challenge, epoch)
+
+
+def unpack_probe(data: bytes) -> Tuple[bytes, int]:
+    return PROBE.unpack(data)
+
+
+def unpack_probe_ack(data: bytes) -> Tuple[bytes, bytes]:
+    return bytes(data[:PROBE_CHALLENGE]), bytes(data[PROBE_CHALLENGE:])
+
+
+def pack_id(node_id: int) -> bytes:
+    return node_id.to_bytes(20, byteorder='big')
+
+
+def unpack_id(data: bytes) -> int:
+    return int.from_bytes(NODE_ID.unpack_from(data)[0], byteorder='big')
+
+
+def pack_contacts(contacts: Iterable[Tuple[str, int]]) -> bytes:
+    return b"".join(CONTACT.pack(socket.inet_aton(addr), port) for addr, port in contacts)
+
+
+def unpack_contacts(data: bytes) -> List[Tuple[str, int]]:
+    return [(socket.inet_ntoa(addr), port) for addr, port in CONTACT.iter_unpack(data)]
+
+
+def pack_file(file: File) -> bytes:
+    return FILE.pack(pack_id(file.id), pack_id(file.owner), file.published_on, file.size) + file.filename.encode()
+
+
+def unpack_file(data: bytes) -> File:
+    file_id, owner, published_on, size = FILE.unpack_from(data)
+    file = File()
+    file.id = int.from_bytes(file_id, byteorder='big')
+    file.owner = int.from_bytes(owner, byteorder='big')
+    file.published_on = published_on
+    file.size = size
+    file.filename = bytes(data[FILE.size:]).decode()
+    return file
+
+
+def pack_value(file: File, holders: List[Tuple[str, int]]) -> bytes:
+    return HOLDERS.pack(len(holders)) + pack_contacts(holders) + pack_file(file)
+
+
+def unpack_value(data: bytes) -> Tuple[File, List[Tuple[str, int]]]:
+    count = HOLDERS.unpack_from(data)[0]
+    start = HOLDERS.size + count * CONTACT.size
+    return unpack_file(data[start:]), unpack_contacts(data[HOLDERS.size:start])
+
+
+def pack_manifest(manifest: Manifest) -> bytes:
+    return MANIFEST.pack(manifest.size, manifest.chunk_size) + manifest.hashes
+
+
+def unpack_manifest(data: bytes) -> Manifest:
+    size, chunk_size = MANIFEST.unpack_from(data)
+    manifest = Manifest(size, chunk_size, bytes(data[MANIFEST.size:]))
+    if not chunk_size or len(manifest) != -(-size // chunk_size) or len(manifest.hashes) % CHUNK_HASH:
+        raise ValueError("Malformed manifest")
+    return manifest
+
+
+def pack_chunk_request(file_id: int, index: int) -> bytes:
+    return CHUNK_REQUEST.pack(pack_id(file_id), index)
+
+
+def unpack_chunk_request(data: bytes) -> Tuple[int, int]:
+    file_id, index = CHUNK_REQUEST.unpack_from(data)
+    return int.from_bytes(file_id, byteorder='big'), index
+
+
+def pack_range_request(file_id: int, offset: int, length: int) -> bytes:
+    return RANGE_REQUEST.pack(pack_id(file_id), offset, length)
+
+
+def unpack_range_request(data: bytes) -> Tuple[int, int, int]:
+    file_id, offset, length = RANGE_REQUEST.unpack_from(data)
+    return int.from_bytes(file_id, byteorder='big'), offset, length
+
+
+def pack_handshake(nonce: int, pub_key: bytes) -> bytes:
+    return POW_NONCE.pack(nonce) + pub_key
+
+
+def unpack_handshake(data: bytes) -> Tuple[int, bytes]:
+    return POW_NONCE.unpack_from(data)[0], data[POW_NONCE.size:]
+
+
+def mask_cookie(key: bytes, cookie: bytes) -> bytes:
+    # the ack travels in the clear, so the cookie is hidden under the fresh session key
+    pad = hmac.new(key, b"cookie", hashlib.sha256).digest()
+    return bytes(a ^ b for a, b in zip(cookie, pad))
+
+
+def pack_handshake_ack(epoch: int, cookie: bytes, pub_key: bytes) -> bytes:
+    return HANDSHAKE_ACK.pack(epoch, cookie) + pub_key
+
+
+def unpack_handshake_ack(data: bytes) -> Tuple[int, bytes, bytes]:
+    epoch, cookie = HANDSHAKE_ACK.unpack_from(data)
+    return epoch, cookie, bytes(data[HANDSHAKE_ACK.size:])
+
+
+def pack_event(data: str, signature: bytes) -> bytes:
+    return SIGNATURE.pack(len(signature)) + signature + data.encode()
+
+
+def unpack_event(data: bytes) -> Tuple[str, bytes]:
+    length = SIGNATURE.unpack_from(data)[0]
+    start = SIGNATURE.size
+    return bytes(data[start + length:]).decode(), bytes(data[start:start + length])